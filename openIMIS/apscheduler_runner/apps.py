@@ -5,7 +5,8 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from django.conf import settings
 from django.apps import AppConfig
 from copy import deepcopy
-import importlib.util
+
+from openIMIS.module_registry import module_registry
 
 
 logger = logging.getLogger(__name__)
@@ -29,14 +30,13 @@ class ApschedulerRunnerConfig(AppConfig):
         self.scheduler.start()
 
     def __add_module_tasks_to_scheduler(self, app_):
-        spec = importlib.util.find_spec(f"{app_}.scheduled_tasks")
-        if spec:
-            try:
-                app = __import__(f"{app_}.scheduled_tasks")
-                app.scheduled_tasks.schedule_tasks(self.scheduler)
-                logger.debug(f"{app_} tasks scheduled")
-            except Exception as exc:
-                logger.debug(f"{app_}: unknown exception occurred during registering scheduled tasks: {exc}")
-        else:
-            logger.debug(f"{app_} has no scheduled_tasks module, skipping")
+        try:
+            scheduled_tasks = module_registry.get_submodule(app_, "scheduled_tasks")
+            if scheduled_tasks is None:
+                logger.debug(f"{app_} has no scheduled_tasks module, skipping")
+                return
+            scheduled_tasks.schedule_tasks(self.scheduler)
+            logger.debug(f"{app_} tasks scheduled")
+        except Exception as exc:
+            logger.debug(f"{app_}: unknown exception occurred during registering scheduled tasks: {exc}")
         
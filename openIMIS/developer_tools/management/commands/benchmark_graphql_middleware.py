@@ -0,0 +1,106 @@
+import time
+from types import SimpleNamespace
+
+import graphene
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from graphene import relay
+from graphql.backend.core import GraphQLCoreBackend
+from graphql_jwt.middleware import JSONWebTokenMiddleware
+
+from openIMIS.operation_middleware import JSONWebTokenOperationMiddleware, operation_middleware_chain
+from openIMIS.schema import GQLUserLanguageMiddleware, GQLUserLanguageOperationMiddleware
+from openIMIS.tracer import TracerMiddleware, TracerOperationMiddleware
+
+FIELD_COUNT = 10
+
+
+class BenchmarkNodeMeta:
+    interfaces = (relay.Node,)
+
+
+BenchmarkNode = type("BenchmarkNode", (graphene.ObjectType,), {
+    "Meta": BenchmarkNodeMeta,
+    **{f"field{i}": graphene.String() for i in range(FIELD_COUNT)},
+})
+
+
+class BenchmarkConnection(relay.Connection):
+    class Meta:
+        node = BenchmarkNode
+
+
+class BenchmarkQuery(graphene.ObjectType):
+    nodes = relay.ConnectionField(BenchmarkConnection)
+
+    def resolve_nodes(self, info, **kwargs):
+        return [
+            BenchmarkNode(id=i, **{f"field{j}": f"value {i}.{j}" for j in range(FIELD_COUNT)})
+            for i in range(kwargs.get("first", 100))
+        ]
+
+
+class Command(BaseCommand):
+    help = "Compare the resolver overhead of the per field GraphQL middleware chain with the per operation " \
+           "middleware stage, on a connection of 100 nodes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--nodes', type=int, default=100)
+
+    def handle(self, *args, **options):
+        schema = graphene.Schema(query=BenchmarkQuery)
+        query = "{ nodes(first: %d) { edges { node { id %s } } } }" % (
+            options['nodes'], " ".join(f"field{i}" for i in range(FIELD_COUNT))
+        )
+        document = GraphQLCoreBackend().document_from_string(schema, query)
+        request = RequestFactory().post("/graphql", content_type="application/json")
+        request.user = SimpleNamespace(is_anonymous=False, language="en")
+        # edges, node and id + fields for every node, plus the connection itself
+        resolver_count = options['nodes'] * (3 + FIELD_COUNT) + 1
+
+        def per_field():
+            return document.execute(
+                context_value=request,
+                middleware=[TracerMiddleware(), GQLUserLanguageMiddleware(), JSONWebTokenMiddleware()],
+            )
+
+        operation_middlewares = [
+            TracerOperationMiddleware(), JSONWebTokenOperationMiddleware(), GQLUserLanguageOperationMiddleware()
+        ]
+
+        def per_operation():
+            # as in GraphQLView.get_middleware, the tracer is left out of the field chain of unsampled operations
+            field_middlewares = [m for m in [TracerMiddleware()] if m.is_enabled(request)]
+            execute = operation_middleware_chain(
+                lambda request, document, operation_name: document.execute(
+                    context_value=request, middleware=field_middlewares
+                ),
+                operation_middlewares,
+            )
+            return execute(request, document, None)
+
+        def no_middleware():
+            return document.execute(context_value=request)
+
+        baseline = self._measure(no_middleware, options['iterations'])
+        self._report("no middleware", baseline, baseline, resolver_count)
+        self._report("per field middleware", self._measure(per_field, options['iterations']), baseline,
+                     resolver_count)
+        self._report("per operation middleware", self._measure(per_operation, options['iterations']), baseline,
+                     resolver_count)
+
+    def _measure(self, execute, iterations):
+        result = execute()
+        if result.errors:
+            raise result.errors[0]
+        start = time.perf_counter()
+        for _ in range(iterations):
+            execute()
+        return (time.perf_counter() - start) / iterations
+
+    def _report(self, name, duration, baseline, resolver_count):
+        overhead = (duration - baseline) / resolver_count
+        self.stdout.write(
+            f"{name:<26} {duration * 1000:8.2f} ms/operation, {overhead * 1000000:6.2f} µs overhead/resolver"
+        )
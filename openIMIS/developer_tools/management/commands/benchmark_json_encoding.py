@@ -0,0 +1,88 @@
+import datetime
+import decimal
+import json
+import time
+import tracemalloc
+import uuid
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from openIMIS.json_encoding import IS_FAST_JSON_ENABLED, FastJSONRenderer, encode_json
+
+
+def graphql_payload(nodes):
+    """Response of a connection query, as produced by graphene: scalars are already serialized"""
+    return {"data": {"insurees": {
+        "totalCount": nodes,
+        "pageInfo": {"hasNextPage": False, "hasPreviousPage": False, "startCursor": "YXJyYXljb25uZWN0aW9uOjA="},
+        "edges": [{"node": {
+            "id": f"SW5zdXJlZUdRTFR5cGU6{i}",
+            "uuid": str(uuid.UUID(int=i)),
+            "chfId": f"{i:09d}",
+            "lastName": f"Last name {i}",
+            "otherNames": "Other names with àccents",
+            "dob": "1990-01-01",
+            "validityFrom": "2024-01-01T00:00:00",
+            "family": {"id": f"RmFtaWx5R1FMVHlwZTo{i}", "headInsuree": {"chfId": f"{i:09d}"}},
+            "gender": {"code": "M"},
+            "marital": None,
+            "cardIssued": True,
+        }} for i in range(nodes)],
+    }}}
+
+
+def rest_payload(nodes):
+    """Serializer data of a REST response, with the types the modules return"""
+    return {"count": nodes, "results": [{
+        "uuid": uuid.UUID(int=i),
+        "code": f"{i:09d}",
+        "name": f"Name {i}",
+        "price": decimal.Decimal("1250.50"),
+        "date_valid_from": datetime.date(2024, 1, 1),
+        "date_created": datetime.datetime(2024, 1, 1, 8, 30, tzinfo=datetime.timezone.utc),
+        "is_deleted": False,
+        "json_ext": {"source": "import", "version": i},
+    } for i in range(nodes)]}
+
+
+class Command(BaseCommand):
+    help = "Compare the standard and fast JSON encodings of a GraphQL and a REST response, in time and peak memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--nodes', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not IS_FAST_JSON_ENABLED:
+            self.stdout.write(self.style.WARNING("orjson is not installed or FAST_JSON_ENCODER is disabled"))
+        graphql_data = graphql_payload(options['nodes'])
+        rest_data = rest_payload(options['nodes'])
+        encoders = [
+            ("graphql standard", lambda: json.dumps(graphql_data, separators=(",", ":"))),
+            ("graphql fast", lambda: encode_json(graphql_data)),
+            ("rest standard", lambda: JSONRenderer().render(rest_data)),
+            ("rest fast", lambda: FastJSONRenderer().render(rest_data)),
+        ]
+        for name, encode in encoders:
+            duration = self._measure(encode, options['iterations'])
+            peak, size = self._peak_memory(encode)
+            self.stdout.write(
+                f"{name:<18} {duration * 1000:8.2f} ms, peak {peak / 1024 / 1024:7.2f} MiB, "
+                f"output {size / 1024 / 1024:6.2f} MiB"
+            )
+
+    def _measure(self, encode, iterations):
+        encode()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            encode()
+        return (time.perf_counter() - start) / iterations
+
+    def _peak_memory(self, encode):
+        tracemalloc.start()
+        try:
+            size = len(encode())
+            return tracemalloc.get_traced_memory()[1], size
+        finally:
+            tracemalloc.stop()
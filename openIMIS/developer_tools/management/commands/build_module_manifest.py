@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from openIMIS.openimisapps import extract_app, get_manifest_path, write_module_manifest
+from openIMIS.openimisconf import load_openimis_conf
+
+
+class Command(BaseCommand):
+    help = "Order the modules of openimis.json and write the module manifest read at startup " \
+           "(OPENIMIS_MODULE_MANIFEST), to run once the modules are installed"
+
+    def handle(self, *args, **options):
+        manifest_path = get_manifest_path()
+        if not manifest_path:
+            self.stdout.write(self.style.WARNING("OPENIMIS_MODULE_MANIFEST is empty, the manifest is disabled"))
+            return
+        manifest = write_module_manifest([*map(extract_app, load_openimis_conf()["modules"])])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote the manifest of {len(manifest['modules'])} modules to {manifest_path}"
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from openIMIS.module_registry import module_registry
+from openIMIS.openimisapps import OPTIONAL_SUBMODULES
+
+
+class Command(BaseCommand):
+    help = "Import the hook submodules of every module through the module registry and report their import " \
+           "times, the slowest modules first. Times include the modules imported first by each hook."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Only report the slowest modules, all of them by default'
+        )
+
+    def handle(self, *args, **options):
+        errors = module_registry.import_all()
+        totals = {}
+        for (app, submodule), seconds in module_registry.import_times.items():
+            totals.setdefault(app, {})[submodule] = seconds * 1000
+        ranking = sorted(totals.items(), key=lambda item: sum(item[1].values()), reverse=True)
+        if options['limit']:
+            ranking = ranking[:options['limit']]
+
+        self.stdout.write(
+            f"{'module':<30}{'total ms':>10}" + "".join(f"{submodule:>17}" for submodule in OPTIONAL_SUBMODULES)
+        )
+        for app, times in ranking:
+            columns = "".join(f"{times[s]:>17.1f}" if s in times else f"{'-':>17}" for s in OPTIONAL_SUBMODULES)
+            self.stdout.write(f"{app:<30}{sum(times.values()):>10.1f}{columns}")
+        total = sum(sum(times.values()) for times in totals.values())
+        self.stdout.write(self.style.SUCCESS(f"{len(totals)} modules, {total:.1f} ms"))
+        for (app, submodule), exc in errors.items():
+            self.stdout.write(self.style.ERROR(f"{app}.{submodule} failed to import: {exc}"))
@@ -0,0 +1,75 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from graphene_django.settings import graphene_settings
+from graphql.language.base import parse
+from graphql.validation import validate
+
+from openIMIS.document_cache import query_hash
+from openIMIS.persisted_queries import read_persisted_queries, write_persisted_queries
+
+
+class Command(BaseCommand):
+    help = "Validate the persisted queries extracted from the frontend build and register them in " \
+           "GRAPHQL_PERSISTED_QUERIES_FILE, the allowlist used when GRAPHQL_PERSISTED_QUERIES_ONLY is enabled"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'manifests',
+            nargs='+',
+            type=str,
+            help='Persisted queries manifests, either {sha256: query} mappings or Apollo style manifests'
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Drop the queries already registered instead of merging with them'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=settings.GRAPHQL_PERSISTED_QUERIES_FILE,
+            help='Allowlist file to write, defaults to GRAPHQL_PERSISTED_QUERIES_FILE'
+        )
+
+    def handle(self, *args, **options):
+        output = options['output']
+        registered = {}
+        if not options['replace'] and os.path.exists(output):
+            registered = read_persisted_queries(output)
+
+        schema = graphene_settings.SCHEMA
+        added = 0
+        rejected = 0
+        for manifest in options['manifests']:
+            try:
+                queries = read_persisted_queries(manifest)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Could not read persisted queries from '{manifest}': {exc}")
+
+            for sha256_hash, query in queries.items():
+                error = self._check_query(schema, sha256_hash, query)
+                if error:
+                    rejected += 1
+                    self.stdout.write(self.style.ERROR(f"{sha256_hash}: {error}"))
+                    continue
+                if sha256_hash not in registered:
+                    added += 1
+                registered[sha256_hash] = query
+
+        write_persisted_queries(output, registered)
+        self.stdout.write(self.style.SUCCESS(
+            f"{added} queries added, {rejected} rejected, {len(registered)} registered in {output}"
+        ))
+
+    def _check_query(self, schema, sha256_hash, query):
+        if query_hash(query) != sha256_hash:
+            return "hash does not match the query"
+        try:
+            validation_errors = validate(schema, parse(query))
+        except Exception as exc:
+            return f"query could not be parsed: {exc}"
+        if validation_errors:
+            return "; ".join(str(error) for error in validation_errors)
+        return None
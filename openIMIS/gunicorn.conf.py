@@ -0,0 +1,8 @@
+import os
+
+
+def child_exit(server, worker):
+    # Prometheus multiprocess mode: drop the live metrics files of the dead worker
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -5,11 +5,13 @@ import logging
 import django
 
 from channels.routing import ProtocolTypeRouter, URLRouter
-from importlib import import_module
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 from django.urls import path
+from .module_registry import module_registry
 from .openimisconf import load_openimis_conf
+from .websocket_auth import JSONWebTokenAuthMiddleware
 logger = logging.getLogger(__name__)
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'openIMIS.settings')
@@ -28,19 +30,19 @@ def SITE_ROOT():
 
 def extract_websocket_urls(module):
     try:
-        module_import = import_module(F"{module['name']}.routing")
+        module_import = module_registry.get_submodule(module['name'], "routing")
+        if module_import is None:
+            logger.log(level=logging.INFO,
+                       msg=F"Websocket routing for module {module['name']} not found, "
+                           F"if you want to attach websocket endpoint add routing.py with websocket_urlpatterns "
+                           F"to your module")
+            return []
         module_routing = module_import.websocket_urlpatterns
 
         if module_routing is None:
             return []
         return module_routing
 
-    except ModuleNotFoundError as e:
-        logger.log(level=logging.INFO,
-                   msg=F"Websocket routing for module {module['name']} not found, "
-                       F"if you want to attach websocket endpoint add routing.py with websocket_urlpatterns "
-                       F"to your module")
-        return []
     except Exception as e:
         logger.log(level=logging.ERROR,
                    msg=F"Failed to load websocket routing for module {module['name']}, reason:\n"
@@ -56,7 +58,19 @@ def openimis_websocket_endpoints():
 
 routings = openimis_websocket_endpoints()
 
+if settings.GRAPHQL_EXPORT_ENABLED:
+    from .export import websocket_urlpatterns as export_websocket_urlpatterns
+    routings += export_websocket_urlpatterns
+
+if settings.GRAPHQL_ASYNC_MUTATIONS_ENABLED:
+    from .async_mutations import websocket_urlpatterns as job_websocket_urlpatterns
+    routings += job_websocket_urlpatterns
+
+if settings.GRAPHQL_SUBSCRIPTIONS_ENABLED:
+    from .subscriptions import websocket_urlpatterns as subscription_websocket_urlpatterns
+    routings += subscription_websocket_urlpatterns
+
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": URLRouter(routings)
+    "websocket": JSONWebTokenAuthMiddleware(URLRouter(routings))
 })
@@ -0,0 +1,95 @@
+import asyncio
+import contextvars
+import threading
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import close_old_connections
+from promise import Promise
+
+_thread_pool = None
+_thread_pool_lock = threading.Lock()
+
+
+def get_thread_pool():
+    """Thread pool of the process executing the GraphQL requests served by asgi_graphql_view"""
+    global _thread_pool
+    if _thread_pool is None:
+        with _thread_pool_lock:
+            if _thread_pool is None:
+                _thread_pool = ThreadPoolExecutor(
+                    max_workers=settings.GRAPHQL_ASGI_THREADS, thread_name_prefix="graphql-asgi"
+                )
+    return _thread_pool
+
+
+class EventLoopExecutor:
+    """
+    graphql-core executor of the requests executed in the thread pool: sync resolvers run in the thread of the
+    request, as usual (ORM, transactions), while the coroutines of async resolvers run on the event loop of the server,
+    overlapping each other. Their results are completed back in the thread of the request. Async resolvers must not
+    use the ORM but through sync_to_async.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        # operations of a batch are executed by several threads
+        self.local = threading.local()
+
+    @property
+    def pending(self):
+        if not hasattr(self.local, "pending"):
+            self.local.pending = {}
+        return self.local.pending
+
+    def wait_until_finished(self):
+        pending = self.pending
+        while pending:
+            done, _ = futures.wait(list(pending), return_when=futures.FIRST_COMPLETED)
+            for future in done:
+                promise = pending.pop(future)
+                # completing the value may resolve and await more fields
+                if future.exception() is not None:
+                    promise.do_reject(future.exception())
+                else:
+                    promise.do_resolve(future.result())
+
+    def clean(self):
+        self.pending.clear()
+
+    def execute(self, fn, *args, **kwargs):
+        result = fn(*args, **kwargs)
+        if asyncio.iscoroutine(result):
+            promise = Promise()
+            self.pending[asyncio.run_coroutine_threadsafe(result, self.loop)] = promise
+            return promise
+        return result
+
+
+def _run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+def asgi_graphql_view(view):
+    """
+    Async view serving a GraphQL view under ASGI: the request is executed by a thread of the GRAPHQL_ASGI_THREADS pool
+    instead of the thread of the sync views, with the async resolvers executed natively (see EventLoopExecutor)
+    """
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        request.graphql_executor = EventLoopExecutor(loop)
+        # with the language and other context of the request
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            get_thread_pool(), partial(context.run, _run_view, view, request, *args, **kwargs)
+        )
+
+    return async_view
@@ -0,0 +1,173 @@
+import logging
+import threading
+import uuid
+
+from asgiref.sync import async_to_sync, sync_to_async
+from celery import shared_task
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import caches
+from django.http import JsonResponse
+from django.urls import path
+
+from .operation_middleware import get_root_fields
+from .response_cache import LOCAL_CACHE_BACKENDS, get_cache_backend
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# job of the mutation executed by the current thread, for report_progress
+_current_job = threading.local()
+
+
+def is_async_mutation(document, operation_name):
+    """Mutations can be executed asynchronously if all their root fields are GRAPHQL_ASYNC_MUTATIONS"""
+    operation_type, root_fields = get_root_fields(document, operation_name)
+    if operation_type != "mutation" or not root_fields or not settings.GRAPHQL_ASYNC_MUTATIONS:
+        return False
+    return all(getattr(field, "name", None) and field.name.value in settings.GRAPHQL_ASYNC_MUTATIONS
+               for field in root_fields)
+
+
+def get_job(job_id):
+    return caches[settings.GRAPHQL_RESPONSE_CACHE_ALIAS].get(f"job:{job_id}")
+
+
+def get_job_status(job):
+    """Job as sent to its websocket subscribers: without its user, nor the result only answered to the user"""
+    return {key: value for key, value in job.items() if key not in ("user", "result")}
+
+
+def save_job(job):
+    caches[settings.GRAPHQL_RESPONSE_CACHE_ALIAS].set(f"job:{job['id']}", job, settings.GRAPHQL_ASYNC_MUTATION_TTL)
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            get_job_group(job["id"]), {"type": "job.status", "status": get_job_status(job)}
+        )
+    except Exception:
+        logger.warning("Failed to notify the GraphQL job %s", job["id"], exc_info=True)
+
+
+def get_job_group(job_id):
+    return f"graphql_job_{job_id}"
+
+
+def create_job(job_id, user_id):
+    return {"id": job_id, "status": JOB_QUEUED, "progress": None, "message": None, "user": user_id, "result": None}
+
+
+def enqueue_mutation(user, data):
+    """Saves a job for the mutation and queues its execution, answering the job"""
+    job = create_job(str(uuid.uuid4()), str(user.id))
+    save_job(job)
+    execute_mutation.delay(job["id"], job["user"], data["query"], data.get("variables"), data.get("operationName"))
+    return job
+
+
+def report_progress(progress, message=None):
+    """
+    Reports the progress (0 to 100) of the mutation executed by the current thread to the subscribers of its job. Does
+    nothing when the mutation is executed synchronously.
+    """
+    job = getattr(_current_job, "job", None)
+    if job is None:
+        return
+    job.update(progress=progress, message=message)
+    save_job(job)
+
+
+@shared_task
+def execute_mutation(job_id, user_id, query, variables=None, operation_name=None):
+    """
+    Celery task executing a mutation enqueued by OpenIMISGraphQLView, as the user who posted it. The cache only keeps
+    the status and progress of its job.
+    """
+    from .views import OpenIMISGraphQLView, create_worker_request
+
+    job = get_job(job_id) or create_job(job_id, user_id)
+    job["status"] = JOB_RUNNING
+    save_job(job)
+    view = OpenIMISGraphQLView()
+    request = create_worker_request(get_user_model().objects.get(id=user_id))
+    data = {"query": query, "variables": variables, "operationName": operation_name}
+    _current_job.job = job
+    try:
+        result = view.execute_graphql_request(request, data, query, variables, operation_name)
+    except Exception as exc:
+        logger.warning("GraphQL job %s failed", job_id, exc_info=True)
+        job.update(status=JOB_FAILED, result={"errors": [{"message": str(exc)}]})
+    else:
+        response = {"data": result.data}
+        if result.errors:
+            response["errors"] = [view.format_error(error) for error in result.errors]
+        job.update(status=JOB_FAILED if result.errors or result.invalid else JOB_DONE, result=response)
+    finally:
+        _current_job.job = None
+    save_job(job)
+
+
+def job_view(request, job_id):
+    """Status of a job of the user, with the response of its mutation once executed"""
+    from .views import authenticate_request
+
+    if not authenticate_request(request):
+        return JsonResponse({"errors": [{"message": "Authentication required"}]}, status=401)
+    job = get_job(job_id)
+    if job is None or job["user"] != str(request.user.id):
+        return JsonResponse({"errors": [{"message": "Unknown job"}]}, status=404)
+    return JsonResponse({**get_job_status(job), "result": job["result"]})
+
+
+def check_async_mutations_cache(app_configs, **kwargs):
+    """The jobs are shared by the web workers and the Celery workers through GRAPHQL_RESPONSE_CACHE_ALIAS"""
+    if not settings.GRAPHQL_ASYNC_MUTATIONS_ENABLED:
+        return []
+    backend = get_cache_backend(settings.GRAPHQL_RESPONSE_CACHE_ALIAS)
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [checks.Error(
+        f"GRAPHQL_ASYNC_MUTATIONS_ENABLED requires the {settings.GRAPHQL_RESPONSE_CACHE_ALIAS} cache to be shared "
+        f"by the web and Celery workers, not {backend}.",
+        hint="Set CACHE_BACKEND and CACHE_URL to a shared cache (Redis, Memcached).",
+        id="openIMIS.E001",
+    )]
+
+
+class GraphQLJobConsumer(AsyncJsonWebsocketConsumer):
+    """Sends the status and progress of a job to its user, from its current one"""
+
+    async def connect(self):
+        self.job_id = self.scope["url_route"]["kwargs"]["job_id"]
+        self.subscribed = False
+        user = self.scope.get("user")
+        job = await sync_to_async(get_job)(self.job_id)
+        if user is None or not user.is_authenticated or job is None or job["user"] != str(user.id):
+            await self.close()
+            return
+        if self.channel_layer is not None:
+            await self.channel_layer.group_add(get_job_group(self.job_id), self.channel_name)
+            self.subscribed = True
+        await self.accept()
+        await self.send_json(get_job_status(job))
+
+    async def disconnect(self, code):
+        if self.subscribed:
+            await self.channel_layer.group_discard(get_job_group(self.job_id), self.channel_name)
+
+    async def job_status(self, event):
+        await self.send_json(event["status"])
+
+
+websocket_urlpatterns = [
+    path("ws/graphql/jobs/<uuid:job_id>", GraphQLJobConsumer.as_asgi()),
+]
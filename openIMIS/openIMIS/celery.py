@@ -1,6 +1,7 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.signals import task_prerun, task_postrun
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'openIMIS.settings')
@@ -17,6 +18,19 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 
+@task_prerun.connect
+def task_prerun_metrics(task_id=None, **kwargs):
+    # imported here as Django settings are not loaded yet when this module is
+    from .metrics import celery_task_started
+    celery_task_started(task_id)
+
+
+@task_postrun.connect
+def task_postrun_metrics(task_id=None, task=None, state=None, **kwargs):
+    from .metrics import celery_task_finished
+    celery_task_finished(task_id, task.name if task else "unknown", state)
+
+
 @app.task(bind=True)
 def debug_task(self):
     print('Request: {0!r}'.format(self.request))
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql.execution import ExecutionResult
+
+from .document_cache import query_hash
+from .field_cache import CacheScope, scope_key
+
+logger = logging.getLogger(__name__)
+
+# how often the operations waiting for another worker check whether its result is available
+SHARED_POLL_INTERVAL = 0.05
+
+
+class SharedExecutionResult(ExecutionResult):
+    """Result of an operation shared by concurrent requests, which also share its JSON encoding"""
+    __slots__ = "encoded", "lock"
+
+    def __init__(self, data=None, errors=None, invalid=False, extensions=None):
+        super().__init__(data=data, errors=errors, invalid=invalid, extensions=extensions)
+        self.encoded = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_result(cls, result):
+        return cls(data=result.data, errors=result.errors, invalid=result.invalid, extensions=result.extensions)
+
+    def encode(self, key, json_encode):
+        with self.lock:
+            if key not in self.encoded:
+                self.encoded[key] = json_encode()
+            return self.encoded[key]
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs a function once for all the threads calling it concurrently with the same key"""
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+single_flight = SingleFlight()
+
+
+class CoalescingOperationMiddleware:
+    """
+    Identical read-only operations (same query, variables and GRAPHQL_COALESCING_SCOPE) running concurrently in a
+    worker share one execution and one JSON encoding, the first one executing it for all. With
+    GRAPHQL_COALESCING_SHARED, the workers also wait for each other through a lock in GRAPHQL_RESPONSE_CACHE_ALIAS and
+    the error free results are kept there, up to GRAPHQL_COALESCING_RESULT_TTL seconds, for the workers that were
+    waiting: the results are never reused by later requests.
+    The results are only shared between the requests of a user by default: in the "role" and "global" scopes, users
+    with the same rights and row security scope (or all of them) share the results, which only suits the deployments
+    whose operations do not depend on the user itself. Pretty printed responses (?pretty) are coalesced apart.
+    """
+
+    def execute(self, next, request, document, operation_name):
+        if not settings.GRAPHQL_COALESCING_ENABLED or document.get_operation_type(operation_name) != "query" \
+                or getattr(request, "graphql_stream", None) is not None:
+            return next(request, document, operation_name)
+
+        key = self.get_key(request, document, operation_name)
+
+        def execute():
+            if settings.GRAPHQL_COALESCING_SHARED:
+                result = self.execute_shared(key, next, request, document, operation_name)
+            else:
+                result = next(request, document, operation_name)
+            return SharedExecutionResult.from_result(result)
+
+        return single_flight.do(key, execute)
+
+    def get_key(self, request, document, operation_name):
+        variables = json.dumps(getattr(request, "graphql_variables", None), sort_keys=True, default=str)
+        key = hashlib.sha256("\n".join((
+            query_hash(document.document_string),
+            operation_name or "",
+            variables,
+            # the followers reuse the JSON encoding of the leader
+            "pretty" if request.GET.get("pretty") else "",
+            scope_key(CacheScope(settings.GRAPHQL_COALESCING_SCOPE), request.user),
+        )).encode("utf-8")).hexdigest()
+        return f"coalescing:{key}"
+
+    def execute_shared(self, key, next, request, document, operation_name):
+        """
+        Executes the operation once for the workers waiting for it: the leader takes the lock with a generation of its
+        own, the followers register to that generation while it runs and read its result, deleted by the last one.
+        Requests arriving once the leader is done execute the operation again.
+        """
+        cache = caches[settings.GRAPHQL_RESPONSE_CACHE_ALIAS]
+        lock_key = f"{key}:lock"
+        timeout = settings.GRAPHQL_COALESCING_TIMEOUT
+        deadline = time.monotonic() + timeout
+        generation = uuid.uuid4().hex
+        followed = None
+        while True:
+            if followed is None:
+                # the waiters counter of a generation exists before its lock
+                cache.set(f"{key}:{generation}:waiters", 0, timeout=timeout)
+                if cache.add(lock_key, generation, timeout=timeout):
+                    break
+                cache.delete(f"{key}:{generation}:waiters")
+                running = cache.get(lock_key)
+                if running is not None:
+                    try:
+                        cache.incr(f"{key}:{running}:waiters")
+                        followed = running
+                        continue
+                    except ValueError:
+                        # the generation ended meanwhile
+                        pass
+            else:
+                result = self.get_followed_result(cache, key, followed)
+                if result is not None:
+                    return result
+                if cache.get(lock_key) != followed:
+                    # the leader is done, possibly between both lookups
+                    result = self.get_followed_result(cache, key, followed)
+                    # its result was not shared (errors), executed as usual
+                    return result or next(request, document, operation_name)
+            if time.monotonic() > deadline:
+                logger.warning("Timeout waiting for the coalesced operation %s of another worker", operation_name)
+                return next(request, document, operation_name)
+            time.sleep(SHARED_POLL_INTERVAL)
+
+        result_key = f"{key}:{generation}:result"
+        try:
+            result = next(request, document, operation_name)
+            if not result.errors and not result.invalid and result.data is not None:
+                cache.set(result_key, result.data, settings.GRAPHQL_COALESCING_RESULT_TTL)
+            return result
+        finally:
+            cache.delete(lock_key)
+            if not cache.get(f"{key}:{generation}:waiters"):
+                cache.delete_many([result_key, f"{key}:{generation}:waiters"])
+
+    def get_followed_result(self, cache, key, generation):
+        """Result of the generation for one of its waiters, the last one deleting it"""
+        data = cache.get(f"{key}:{generation}:result")
+        if data is None:
+            return None
+        try:
+            waiting = cache.decr(f"{key}:{generation}:waiters")
+        except ValueError:
+            waiting = 0
+        if waiting <= 0:
+            cache.delete_many([f"{key}:{generation}:result", f"{key}:{generation}:waiters"])
+        return ExecutionResult(data=data)
@@ -1,10 +1,180 @@
+import threading
+from collections import defaultdict
+from functools import partial
+
 from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import ForeignKey
+from promise import Promise
+from promise.dataloader import DataLoader
 
 
-def get_dataloaders():
-    dataloaders = dict()
-    for app in apps.get_app_configs():
-        if hasattr(app, "set_dataloaders"):
-            app.set_dataloaders(dataloaders)
+class ModelFieldLoader(DataLoader):
+    """Loads the instances of a model by a unique field (primary key, uuid), None for unknown keys"""
+
+    def __init__(self, model, field_name):
+        super().__init__()
+        self.model = model
+        self.field = model._meta.get_field(field_name)
+
+    def batch_load_fn(self, keys):
+        keys = [self.field.to_python(key) for key in keys]
+        instances = {
+            self.field.value_from_object(instance): instance
+            for instance in self.model.objects.filter(**{f"{self.field.name}__in": keys})
+        }
+        return Promise.resolve([instances.get(key) for key in keys])
+
+
+class ForeignKeyLoader(DataLoader):
+    """Loads the lists of instances of a model referring to the given keys through one of its foreign keys"""
+
+    def __init__(self, model, field_name):
+        super().__init__()
+        self.model = model
+        self.field = model._meta.get_field(field_name)
+
+    def batch_load_fn(self, keys):
+        grouped = defaultdict(list)
+        for instance in self.model.objects.filter(**{f"{self.field.attname}__in": keys}):
+            grouped[getattr(instance, self.field.attname)].append(instance)
+        return Promise.resolve([grouped.get(key, []) for key in keys])
+
+
+def model_loader_key(model, by):
+    return f"{model._meta.app_label}.{model.__name__}.by_{by}"
+
+
+def _model_loader_factory(key):
+    """
+    Resolves a "<app_label>.<Model>.by_<field>" key to the factory of its automatic loader, None if there is none:
+    by_id and by_uuid load single instances, by_<foreign key> the instances referring to the given ids.
+    """
+    parts = key.split(".") if isinstance(key, str) else []
+    if len(parts) != 3 or not parts[2].startswith("by_"):
+        return None
+    app_label, model_name, field_name = parts[0], parts[1], parts[2][3:]
+    try:
+        model = apps.get_model(app_label, model_name)
+    except LookupError:
+        return None
+    if model._meta.app_config.name not in settings.OPENIMIS_APPS:
+        return None
+    if field_name == "id":
+        return partial(ModelFieldLoader, model, model._meta.pk.name)
+    try:
+        field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        return None
+    if field_name == "uuid":
+        return partial(ModelFieldLoader, model, field_name)
+    if isinstance(field, ForeignKey):
+        return partial(ForeignKeyLoader, model, field_name)
+    return None
+
+
+class DataLoaderRegistry:
+    """
+    Where the loaders of a request come from, collected once per process:
+    - the apps' set_dataloaders(dataloaders) hooks, called once to know which keys each app provides and then only
+      when a request first uses one of them,
+    - the automatic model loaders, whose keys are resolved once.
+    """
+
+    def __init__(self):
+        self._app_keys = None
+        self._model_factories = {}
+        self._lock = threading.Lock()
+
+    @property
+    def app_keys(self):
+        if self._app_keys is None:
+            with self._lock:
+                if self._app_keys is None:
+                    app_keys = {}
+                    for app in apps.get_app_configs():
+                        if hasattr(app, "set_dataloaders"):
+                            provided = {}
+                            app.set_dataloaders(provided)
+                            app_keys.update({key: app for key in provided})
+                    self._app_keys = app_keys
+        return self._app_keys
+
+    def create_loaders(self, key):
+        """Returns the {key: loader} created for a key: all the loaders of the app providing it or one model loader"""
+        app = self.app_keys.get(key)
+        if app is not None:
+            loaders = {}
+            app.set_dataloaders(loaders)
+            return loaders
+        if key not in self._model_factories:
+            self._model_factories[key] = _model_loader_factory(key)
+        factory = self._model_factories[key]
+        return {key: factory()} if factory else {}
 
-    return dataloaders
+
+dataloader_registry = DataLoaderRegistry()
+
+
+class DataLoaders(dict):
+    """
+    Request scoped dataloaders, created on first access. Besides the loaders set by the apps (set_dataloaders),
+    batched loaders are available for every model of the openIMIS apps, for instance:
+        info.context.dataloaders["insuree.Insuree.by_id"].load(insuree_id)
+        info.context.dataloaders["insuree.Insuree.by_uuid"].load(insuree_uuid)
+        info.context.dataloaders["insuree.Insuree.by_family"].load(family_id)  # members of the family
+    These loaders do not apply any validity or row security filter: use them to resolve relations of objects the
+    user is already allowed to see.
+    The number of batches dispatched and keys loaded by each loader is kept in stats.
+    """
+
+    def __init__(self, registry=dataloader_registry):
+        super().__init__()
+        self.registry = registry
+        self.stats = {}
+
+    def __missing__(self, key):
+        loaders = self.registry.create_loaders(key)
+        if key not in loaders:
+            raise KeyError(key)
+        for loader_key, loader in loaders.items():
+            if not dict.__contains__(self, loader_key):
+                self[loader_key] = self._count_batches(loader_key, loader)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self.registry.app_keys
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _count_batches(self, key, loader):
+        batch_load_fn = getattr(loader, "batch_load_fn", None)
+        if batch_load_fn is None:
+            return loader
+        stats = self.stats.setdefault(key, {"batches": 0, "keys": 0})
+
+        def counting_batch_load_fn(keys):
+            stats["batches"] += 1
+            stats["keys"] += len(keys)
+            return batch_load_fn(keys)
+
+        loader.batch_load_fn = counting_batch_load_fn
+        return loader
+
+    def by_id(self, model):
+        return self[model_loader_key(model, "id")]
+
+    def by_uuid(self, model):
+        return self[model_loader_key(model, "uuid")]
+
+    def by_foreign_key(self, model, field_name):
+        return self[model_loader_key(model, field_name)]
+
+
+def get_dataloaders():
+    return DataLoaders()
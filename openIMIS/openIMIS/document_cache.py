@@ -0,0 +1,130 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.cache import get_unique_schema_id
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import execute, ExecutionResult
+from graphql.language.base import parse
+from graphql.validation import validate
+
+from .metrics import GRAPHQL_DOCUMENT_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+
+class LRUDocumentCache:
+    """
+    Bounded, thread safe LRU map of GraphQL documents. Each gunicorn worker keeps its own instance.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+            if document is None:
+                self.misses += 1
+            else:
+                self._documents.move_to_end(key)
+                self.hits += 1
+        GRAPHQL_DOCUMENT_CACHE_REQUESTS.labels("miss" if document is None else "hit").inc()
+        return document
+
+    def set(self, key, document):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._documents[key] = document
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.maxsize:
+                self._documents.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._documents),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def _return_errors(errors, *args, **kwargs):
+    return ExecutionResult(errors=errors, invalid=True)
+
+
+class CachedDocumentBackend(GraphQLCoreBackend):
+    """
+    GraphQL backend that parses and validates a query once and keeps the resulting document in an LRU cache, if it is
+    valid. Unlike the core backend, validation happens here and not on every document.execute().
+    """
+
+    def __init__(self, cache, max_query_length=None, executor=None):
+        super().__init__(executor=executor)
+        self.cache = cache
+        self.max_query_length = max_query_length
+
+    def get_key(self, schema, query):
+        return get_unique_schema_id(schema), query_hash(query)
+
+    def document_from_string(self, schema, document_string):
+        if not isinstance(document_string, str) or (
+                self.max_query_length and len(document_string) > self.max_query_length):
+            return super().document_from_string(schema, document_string)
+
+        key = self.get_key(schema, document_string)
+        document = self.cache.get(key)
+        if document is None:
+            # parse errors are raised to the view and never cached
+            document_ast = parse(document_string)
+            validation_errors = validate(schema, document_ast)
+            document = self.build_document(schema, document_string, document_ast, validation_errors)
+            if not validation_errors:
+                # invalid operations, as many as a client can make up, must not evict the valid ones
+                self.cache.set(key, document)
+        return document
+
+    def build_document(self, schema, document_string, document_ast, validation_errors=None):
+        if validation_errors is None:
+            validation_errors = validate(schema, document_ast)
+        if validation_errors:
+            execute_document = partial(_return_errors, validation_errors)
+        else:
+            execute_document = partial(execute, schema, document_ast, **self.execute_params)
+        return GraphQLDocument(
+            schema=schema,
+            document_string=document_string,
+            document_ast=document_ast,
+            execute=execute_document,
+        )
+
+
+document_cache = LRUDocumentCache(settings.GRAPHQL_DOCUMENT_CACHE_SIZE)
+document_backend = CachedDocumentBackend(
+    document_cache, max_query_length=settings.GRAPHQL_DOCUMENT_CACHE_MAX_QUERY_LENGTH
+)
+
+
+def get_document_cache_stats():
+    return document_cache.stats()
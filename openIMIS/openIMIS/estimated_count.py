@@ -0,0 +1,143 @@
+import hashlib
+import json
+import logging
+
+import graphene
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import QuerySet
+from graphene_django.utils import maybe_queryset
+from graphql_relay.connection.arrayconnection import get_offset_with_default
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_count(alias, sql, params):
+    """Row count of a query estimated by the planner of the database, None if it cannot tell"""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]["Plan"]["Plan Rows"])
+            if connection.vendor == "microsoft":
+                # the statements are not executed while SHOWPLAN_ALL is on, the first row estimates the whole query
+                cursor.execute("SET SHOWPLAN_ALL ON")
+                try:
+                    cursor.execute(sql, params)
+                    columns = [column[0] for column in cursor.description]
+                    return int(float(cursor.fetchone()[columns.index("EstimateRows")]))
+                finally:
+                    cursor.execute("SET SHOWPLAN_ALL OFF")
+    except Exception:
+        logger.warning("Failed to estimate the count of %s", sql, exc_info=True)
+    return None
+
+
+def get_estimated_count(queryset):
+    """
+    Count of the queryset in the estimated mode: the exact one if it is cached, the planner estimate if it is at
+    least GRAPHQL_ESTIMATED_COUNT_THRESHOLD, queuing the exact count (exact_count). None if the queryset has to be
+    counted as usual.
+    """
+    # the same objects, whatever their ordering and annotations, share their count
+    try:
+        sql, params = queryset.order_by().values("pk").query.get_compiler(using=queryset.db).as_sql()
+    except EmptyResultSet:
+        # none() or filters matching nothing (pk__in=[]) are not even queried
+        return 0
+    key = hashlib.sha256(
+        json.dumps([queryset.db, sql, params], cls=DjangoJSONEncoder).encode("utf-8")
+    ).hexdigest()
+    key = f"count:{key}"
+    cache = caches[settings.GRAPHQL_RESPONSE_CACHE_ALIAS]
+    count = cache.get(key)
+    if count is not None:
+        return count
+    estimate = estimate_count(queryset.db, sql, params)
+    if estimate is None or estimate < settings.GRAPHQL_ESTIMATED_COUNT_THRESHOLD:
+        return None
+    if cache.add(f"{key}:pending", True, settings.GRAPHQL_ESTIMATED_COUNT_TTL):
+        try:
+            exact_count.delay(key, queryset.db, sql, params)
+        except Exception:
+            logger.warning("Failed to queue the exact count of %s", sql, exc_info=True)
+            cache.delete(f"{key}:pending")
+    return estimate
+
+
+@shared_task
+def exact_count(key, alias, sql, params):
+    """Counts a query estimated by get_estimated_count, for the next requests"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM ({sql}) counted", params)
+        count = cursor.fetchone()[0]
+    caches[settings.GRAPHQL_RESPONSE_CACHE_ALIAS].set(key, count, settings.GRAPHQL_ESTIMATED_COUNT_TTL)
+    return count
+
+
+def with_count(queryset, count):
+    """Copy of the queryset answering count without querying the database"""
+    queryset = queryset.all()
+    queryset.count = lambda: count
+    return queryset
+
+
+class EstimatedCountMixin:
+    """
+    Relay connection field mixin adding an `estimatedCount` argument: when true, the connection is not counted with
+    a COUNT(*) on every page. Its totalCount is the last exact count (computed asynchronously by a Celery worker and
+    kept GRAPHQL_ESTIMATED_COUNT_TTL seconds) or the estimate of the database planner, and its hasNextPage is only
+    false once a page is not full. Connections under GRAPHQL_ESTIMATED_COUNT_THRESHOLD objects, paginated backwards
+    or on other databases than PostgreSQL and SQL Server are counted as usual. With keyset pagination, put it after
+    KeysetPaginationMixin:
+
+        class ClaimConnectionField(KeysetPaginationMixin, EstimatedCountMixin, OrderedDjangoFilterConnectionField):
+            pass
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("estimated_count", graphene.Boolean(
+            description="Estimate totalCount instead of counting the objects on every page"
+        ))
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None, **kwargs):
+        iterable = maybe_queryset(iterable)
+        page_size = args.get("first") or max_limit
+        if not args.get("estimated_count") or not isinstance(iterable, QuerySet) or not page_size \
+                or args.get("last") or args.get("before"):
+            return super().resolve_connection(connection, args, iterable, max_limit, **kwargs)
+        count = get_estimated_count(iterable)
+        if count is None:
+            return super().resolve_connection(connection, args, iterable, max_limit, **kwargs)
+
+        start = get_offset_with_default(args.get("after"), -1) + 1 + (args.get("offset") or 0)
+        # the estimate only bounds the page if it leaves room for one more object: an underestimated count must not
+        # truncate it
+        result = super().resolve_connection(
+            connection, args, with_count(iterable, max(count, start + page_size + 1)), max_limit, **kwargs
+        )
+        if len(result.edges) < page_size:
+            result.page_info.has_next_page = False
+            result.length = start + len(result.edges)
+        else:
+            result.length = max(count, start + len(result.edges))
+        result.iterable = iterable
+        return result
+
+    @classmethod
+    def get_total_count(cls, queryset, args):
+        if args.get("estimated_count"):
+            count = get_estimated_count(queryset)
+            if count is not None:
+                return count
+        return queryset.count()
@@ -0,0 +1,281 @@
+import csv
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+
+from asgiref.sync import async_to_sync, sync_to_async
+from celery import shared_task
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import FileResponse, HttpResponseNotAllowed, JsonResponse
+from django.urls import path
+from graphene_django.views import HttpError
+
+from .json_encoding import encode_json
+from .streaming import ConnectionStream
+from .views import OpenIMISGraphQLView, authenticate_request, create_worker_request
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class ExportError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class NDJSONExportWriter:
+    """One JSON object per line and per exported node"""
+
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, nodes):
+        for node in nodes:
+            self.file.write(encode_json(node).decode("utf-8"))
+            self.file.write("\n")
+
+
+class CSVExportWriter:
+    """
+    One row per exported node, nested objects flattened into dotted columns (family.headInsuree.chfId), lists as
+    JSON. The columns are those of the first page.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.writer = None
+
+    def write(self, nodes):
+        rows = [self.flatten(node) for node in nodes]
+        if self.writer is None:
+            columns = list(dict.fromkeys(column for row in rows for column in row))
+            self.writer = csv.DictWriter(self.file, fieldnames=columns, restval="", extrasaction="ignore")
+            self.writer.writeheader()
+        self.writer.writerows(rows)
+
+    @classmethod
+    def flatten(cls, value, prefix=""):
+        row = {}
+        for key, item in value.items():
+            if isinstance(item, dict):
+                row.update(cls.flatten(item, f"{prefix}{key}."))
+            elif isinstance(item, list):
+                row[f"{prefix}{key}"] = encode_json(item).decode("utf-8")
+            else:
+                row[f"{prefix}{key}"] = item
+        return row
+
+
+EXPORT_WRITERS = {
+    "ndjson": NDJSONExportWriter,
+    "csv": CSVExportWriter,
+}
+
+
+def get_export_directory(user_id="*"):
+    return os.path.join(settings.MEDIA_ROOT, settings.GRAPHQL_EXPORT_DIRECTORY, str(user_id))
+
+
+def get_export_status(export_id, user_id="*"):
+    """Status of an export (pending, done or failed), with the path of its file or its errors"""
+    directory = get_export_directory(user_id)
+    for export_format in EXPORT_WRITERS:
+        for file_path in glob.glob(os.path.join(directory, f"{export_id}.{export_format}")):
+            return {"id": str(export_id), "status": "done", "format": export_format}, file_path
+    for file_path in glob.glob(os.path.join(directory, f"{export_id}.errors.json")):
+        with open(file_path, encoding="utf-8") as file:
+            return {"id": str(export_id), "status": "failed", "errors": json.load(file)}, None
+    return {"id": str(export_id), "status": "pending"}, None
+
+
+@shared_task
+def delete_expired_exports():
+    """
+    Celery task deleting the export files (errors and abandoned partial files included) older than
+    GRAPHQL_EXPORT_RETENTION seconds, run before every export
+    """
+    expiry = time.time() - settings.GRAPHQL_EXPORT_RETENTION
+    deleted = 0
+    for file_path in glob.glob(os.path.join(get_export_directory(), "*")):
+        try:
+            if os.path.getmtime(file_path) < expiry:
+                os.remove(file_path)
+                deleted += 1
+        except OSError:
+            # deleted by another worker
+            continue
+    if deleted:
+        logger.info("Deleted %s expired GraphQL export files", deleted)
+    return deleted
+
+
+def get_export_group(export_id, user_id):
+    return f"graphql_export_{user_id}_{export_id}"
+
+
+def notify_export(status, user_id):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            get_export_group(status["id"], user_id), {"type": "export.status", "status": status}
+        )
+    except Exception:
+        logger.warning("Failed to notify the GraphQL export %s", status["id"], exc_info=True)
+
+
+def run_export(export_id, user, data, export_format):
+    """
+    Executes the query of the export page by page (see ConnectionStream), as the user, writing the nodes of its
+    connection to the export file. The file only gets its final name once complete.
+    """
+    view = GraphQLExportView()
+    request = create_worker_request(user)
+    stream = request.graphql_stream = ConnectionStream(settings.GRAPHQL_EXPORT_PAGE_SIZE)
+    query, variables, operation_name, _ = view.get_graphql_params(request, data)
+
+    def execute_page():
+        result = view.execute_graphql_request(request, data, query, variables, operation_name)
+        if result.errors or result.invalid:
+            raise ExportError([view.format_error(error) for error in result.errors or []])
+        if not stream.started:
+            raise ExportError([{"message": "Only queries on a single connection with edges can be exported"}])
+        return [edge.get("node", edge) for edge in result.data[stream.field_key][stream.edges_key] or []]
+
+    directory = get_export_directory(user.id)
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, f"{export_id}.{export_format}")
+    partial_path = f"{file_path}.part"
+    try:
+        with open(partial_path, "w", newline="", encoding="utf-8") as file:
+            writer = EXPORT_WRITERS[export_format](file)
+            writer.write(execute_page())
+            while stream.has_more:
+                writer.write(execute_page())
+        os.replace(partial_path, file_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+    return stream.position
+
+
+@shared_task
+def export_graphql(export_id, user_id, data, export_format):
+    """
+    Celery task writing the result of an export requested to GraphQLExportView to the exports directory of the user,
+    then notifying the subscribers of the export (GraphQLExportConsumer). The expired exports are deleted first.
+    """
+    delete_expired_exports()
+    user = get_user_model().objects.get(id=user_id)
+    try:
+        count = run_export(export_id, user, data, export_format)
+        logger.info("GraphQL export %s of %s objects done", export_id, count)
+    except Exception as exc:
+        errors = exc.errors if isinstance(exc, ExportError) else [{"message": str(exc)}]
+        logger.warning("GraphQL export %s failed: %s", export_id, errors, exc_info=not isinstance(exc, ExportError))
+        directory = get_export_directory(user_id)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{export_id}.errors.json"), "w", encoding="utf-8") as file:
+            json.dump(errors, file)
+    notify_export(get_export_status(export_id, user_id)[0], user_id)
+
+
+class GraphQLExportView(OpenIMISGraphQLView):
+    """
+    POST {"query", "variables", "operationName", "format": "ndjson" or "csv"} schedules the export of the nodes of
+    the only connection of the query (without its RELAY_CONNECTION_MAX_LIMIT) and answers its id. GET on
+    graphql/export/<id> answers the export file once done, its status otherwise. Completion is also notified to the
+    websocket ws/graphql/export/<id>.
+    """
+
+    def dispatch(self, request, *args, export_id=None, **kwargs):
+        try:
+            if not authenticate_request(request):
+                return JsonResponse({"errors": [{"message": "Authentication required"}]}, status=401)
+            if export_id is not None and request.method == "GET":
+                return self.get_export(request, export_id)
+            if export_id is None and request.method == "POST":
+                return self.post_export(request)
+            raise HttpError(HttpResponseNotAllowed(
+                ["GET"] if export_id else ["POST"], "Unsupported method for GraphQL exports."
+            ))
+        except HttpError as e:
+            return self.get_error_response(request, e)
+
+    def get_export(self, request, export_id):
+        status, file_path = get_export_status(export_id, request.user.id)
+        if file_path is None:
+            return JsonResponse(status, status=202 if status["status"] == "pending" else 200)
+        return FileResponse(
+            open(file_path, "rb"),
+            as_attachment=True,
+            filename=os.path.basename(file_path),
+            content_type=EXPORT_CONTENT_TYPES[status["format"]],
+        )
+
+    def post_export(self, request):
+        data = self.parse_body(request)
+        export_format = data.get("format") or "ndjson"
+        if export_format not in EXPORT_WRITERS:
+            return JsonResponse({"errors": [{"message": f"Unsupported export format {export_format}"}]}, status=400)
+        query, variables, operation_name, _ = self.get_graphql_params(request, data)
+        try:
+            query, document = self.get_document(request, data, query)
+        except Exception as e:
+            return JsonResponse({"errors": [self.format_error(e)]}, status=400)
+        if document.get_operation_type(operation_name) != "query":
+            return JsonResponse({"errors": [{"message": "Only queries can be exported"}]}, status=400)
+
+        export_id = str(uuid.uuid4())
+        export_graphql.delay(
+            export_id,
+            str(request.user.id),
+            {"query": query, "variables": variables, "operationName": operation_name},
+            export_format,
+        )
+        return JsonResponse({"id": export_id, "status": "pending", "url": f"{request.path}/{export_id}"}, status=202)
+
+
+class GraphQLExportConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Sends the status of an export of the authenticated user once it is done or failed, right away if it already is
+    """
+
+    async def connect(self):
+        self.export_id = self.scope["url_route"]["kwargs"]["export_id"]
+        self.group = None
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+        if self.channel_layer is not None:
+            self.group = get_export_group(self.export_id, user.id)
+            await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        status, _ = await sync_to_async(get_export_status)(self.export_id, user.id)
+        if status["status"] != "pending":
+            await self.send_json(status)
+
+    async def disconnect(self, code):
+        if self.group is not None:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def export_status(self, event):
+        await self.send_json(event["status"])
+
+
+websocket_urlpatterns = [
+    path("ws/graphql/export/<uuid:export_id>", GraphQLExportConsumer.as_asgi()),
+]
@@ -0,0 +1,111 @@
+import functools
+import hashlib
+import json
+from enum import Enum
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db.models import Model, QuerySet
+from django.utils import translation
+from promise import Promise, is_thenable
+
+from .response_cache import LOCAL_CACHE_BACKENDS, cache_tags, get_cache_backend, model_tag, register_tags, user_scope
+
+_MISSING = object()
+
+
+class CacheScope(Enum):
+    # one value per user
+    USER = "user"
+    # shared by the users with the same rights, row security scope and language
+    ROLE = "role"
+    # shared by all the users with the same language
+    GLOBAL = "global"
+
+
+def scope_key(scope, user):
+    if scope == CacheScope.USER:
+        return f"user:{getattr(user, 'id', None)}:{translation.get_language()}"
+    if scope == CacheScope.ROLE:
+        return f"role:{user_scope(user)}"
+    return f"global:{translation.get_language()}"
+
+
+def _root_key(root):
+    """Identity of the parent object, _MISSING if there is none to cache a nested field by"""
+    if root is None:
+        return None
+    if isinstance(root, Model) and root.pk is not None:
+        return f"{model_tag(type(root))}:{root.pk}"
+    return _MISSING
+
+
+def cached(ttl=None, scope=CacheScope.ROLE, tags=()):
+    """
+    Caches the value returned by a field resolver in GRAPHQL_RESPONSE_CACHE_ALIAS for ttl seconds
+    (GRAPHQL_FIELD_CACHE_TTL by default), by field arguments and scope. Saving or deleting one of the tags models
+    invalidates it. Querysets are evaluated before being cached, so only decorate resolvers of fields that do not
+    filter or paginate the returned queryset any further, such as graphene.List fields:
+
+        @cached(ttl=600, scope=CacheScope.GLOBAL, tags=[Item])
+        def resolve_item_categories(self, info, **kwargs):
+            ...
+
+    Nested fields are cached by the primary key of their parent model instance, or not cached at all for other
+    parents.
+    """
+    tags = tuple(tag if isinstance(tag, str) else model_tag(tag) for tag in tags)
+    register_tags(tags)
+
+    def decorator(resolver):
+        name = f"{resolver.__module__}.{resolver.__qualname__}"
+
+        @functools.wraps(resolver)
+        def wrapper(root, info, **kwargs):
+            root_key = _root_key(root)
+            if not settings.GRAPHQL_FIELD_CACHE_ENABLED or root_key is _MISSING:
+                return resolver(root, info, **kwargs)
+
+            cache = caches[settings.GRAPHQL_RESPONSE_CACHE_ALIAS]
+            key = "field:" + hashlib.sha256("\n".join((
+                name,
+                str(root_key),
+                json.dumps(kwargs, sort_keys=True, default=str),
+                scope_key(scope, info.context.user),
+                json.dumps(cache_tags.versions(tags), sort_keys=True),
+            )).encode("utf-8")).hexdigest()
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            def store(value):
+                if isinstance(value, QuerySet):
+                    value = list(value)
+                cache.set(key, value, settings.GRAPHQL_FIELD_CACHE_TTL if ttl is None else ttl)
+                return value
+
+            value = resolver(root, info, **kwargs)
+            if is_thenable(value):
+                return Promise.resolve(value).then(store)
+            return store(value)
+
+        return wrapper
+
+    return decorator
+
+
+def check_field_cache(app_configs, **kwargs):
+    """The tag versions invalidating the field values are shared by the workers through GRAPHQL_RESPONSE_CACHE_ALIAS"""
+    if not settings.GRAPHQL_FIELD_CACHE_ENABLED:
+        return []
+    backend = get_cache_backend(settings.GRAPHQL_RESPONSE_CACHE_ALIAS)
+    if backend not in LOCAL_CACHE_BACKENDS:
+        return []
+    return [checks.Error(
+        f"GRAPHQL_FIELD_CACHE_ENABLED requires the {settings.GRAPHQL_RESPONSE_CACHE_ALIAS} cache to be shared by the "
+        f"web and Celery workers, not {backend}: the others would never see the invalidations of a worker.",
+        hint="Set CACHE_BACKEND and CACHE_URL to a shared cache (Redis, Memcached) or GRAPHQL_FIELD_CACHE_ENABLED to "
+             "false.",
+        id="openIMIS.E002",
+    )]
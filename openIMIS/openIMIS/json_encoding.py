@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ModuleNotFoundError:
+    orjson = None
+
+IS_FAST_JSON_ENABLED = getattr(settings, "FAST_JSON_ENCODER", True) and orjson is not None
+
+# Datetimes are left to the REST framework encoder, which writes UTC as "Z", like the other types orjson does not
+# support natively (Decimal, lazy translations, querysets...)
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson is not None else 0
+COMPACT_SEPARATORS = (",", ":")
+
+_default_encoder = JSONEncoder()
+
+
+def encode_json(data):
+    """
+    Compact JSON encoding of data, as UTF-8 bytes, with orjson when installed and enabled (FAST_JSON_ENCODER). The
+    values orjson rejects (integers over 64 bits, invalid unicode...) fall back to the standard library encoder.
+    """
+    if IS_FAST_JSON_ENABLED:
+        try:
+            return orjson.dumps(data, default=_default_encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass
+    return json.dumps(data, cls=JSONEncoder, separators=COMPACT_SEPARATORS).encode("utf-8")
+
+
+class FastJSONRenderer(JSONRenderer):
+    """REST framework JSON renderer using encode_json for the compact responses, the indented ones are unchanged"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not IS_FAST_JSON_ENABLED or indent is not None or not self.compact or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = encode_json(data)
+        # same escaping as JSONRenderer, for the JSON to be a strict javascript subset
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,243 @@
+import base64
+import datetime
+import json
+import re
+from functools import reduce
+from operator import or_
+
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, QuerySet
+from django.utils.crypto import salted_hmac
+from graphene.relay import PageInfo
+from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+
+KEYSET_CURSOR_PREFIX = "keyset:"
+KEYSET_CURSOR_SALT = "openIMIS.keyset_pagination"
+ORDERING_KEY = re.compile(r"^-?\w+$")
+# annotations holding the sort key values of the nodes, masked fields included
+ANNOTATION_PREFIX = "keyset_cursor_"
+
+
+def is_keyset_cursor(cursor):
+    try:
+        return base64.b64decode(cursor).decode("utf-8").startswith(KEYSET_CURSOR_PREFIX)
+    except (ValueError, TypeError):
+        return False
+
+
+def get_cursor_fernet():
+    """Fernet encrypting the sort key values of the cursors, masked fields included, with a key of SECRET_KEY"""
+    key = salted_hmac(KEYSET_CURSOR_SALT, "cursor", algorithm="sha256").digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+
+def _encode_value(value):
+    # DjangoJSONEncoder cuts times down to milliseconds, the seeks need them to the microsecond
+    if isinstance(value, datetime.datetime):
+        return {"datetime": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"time": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "datetime" in value:
+            return datetime.datetime.fromisoformat(value["datetime"])
+        if "time" in value:
+            return datetime.time.fromisoformat(value["time"])
+        raise ValueError("Invalid cursor")
+    return value
+
+
+def keyset_to_cursor(ordering, values, fernet=None):
+    payload = json.dumps(
+        [ordering, [_encode_value(value) for value in values]], cls=DjangoJSONEncoder, separators=(",", ":")
+    )
+    token = (fernet or get_cursor_fernet()).encrypt(payload.encode("utf-8")).decode("ascii")
+    return base64.b64encode((KEYSET_CURSOR_PREFIX + token).encode("utf-8")).decode("ascii")
+
+
+def cursor_to_keyset(cursor, ordering):
+    token = base64.b64decode(cursor).decode("utf-8")[len(KEYSET_CURSOR_PREFIX):]
+    try:
+        payload = get_cursor_fernet().decrypt(token.encode("ascii"))
+    except InvalidToken:
+        raise ValueError("Invalid cursor")
+    ordering_of_cursor, values = json.loads(payload)
+    if ordering_of_cursor != ordering or len(values) != len(ordering):
+        raise ValueError("The cursor does not match the ordering of the connection")
+    return [_decode_value(value) for value in values]
+
+
+def get_keyset_ordering(queryset):
+    """
+    Ordering of the queryset completed with the primary key to be unique, None if it cannot be paginated by keyset:
+    random or expression orderings, nullable or multi valued sort keys.
+    """
+    query = queryset.query
+    if query.order_by:
+        ordering = list(query.order_by)
+    elif query.default_ordering:
+        ordering = list(queryset.model._meta.ordering)
+    else:
+        ordering = []
+    for key in ordering:
+        if not isinstance(key, str) or not ORDERING_KEY.match(key) or not _is_keyset_field(queryset.model, key):
+            return None
+    names = {key.lstrip("-") for key in ordering}
+    if not names & {"pk", queryset.model._meta.pk.name}:
+        ordering.append("pk")
+    return ordering
+
+
+def _is_keyset_field(model, key):
+    path = key.lstrip("-").split("__")
+    for index, name in enumerate(path):
+        field = model._meta.pk if name == "pk" else _get_field(model, name)
+        if field is None or getattr(field, "null", True):
+            return False
+        last = index == len(path) - 1
+        if field.is_relation:
+            # orderings on a foreign key follow the ordering of the related model
+            if last or not (field.many_to_one or field.one_to_one) or not field.concrete:
+                return False
+            model = field.related_model
+        elif not last:
+            return False
+    return True
+
+
+def _get_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except Exception:
+        return None
+
+
+def seek_filter(ordering, values, forward=True):
+    """
+    Filter of the objects after (forward) or before the sort key values: (a, b) > (x, y) is written
+    a >= x AND (a > x OR (a = x AND b > y)) for the first key to bound an index range scan.
+    """
+    conditions = []
+    equal = Q()
+    for key, value in zip(ordering, values):
+        name = key.lstrip("-")
+        lookup = "lt" if key.startswith("-") == forward else "gt"
+        conditions.append(equal & Q(**{f"{name}__{lookup}": value}))
+        equal &= Q(**{name: value})
+    first_key = ordering[0]
+    first_lookup = "lte" if first_key.startswith("-") == forward else "gte"
+    return Q(**{f"{first_key.lstrip('-')}__{first_lookup}": values[0]}) & reduce(or_, conditions)
+
+
+def get_keyset_values(node, ordering):
+    return [
+        node.pk if key.lstrip("-") == "pk" else getattr(node, f"{ANNOTATION_PREFIX}{index}")
+        for index, key in enumerate(ordering)
+    ]
+
+
+class LazyCount:
+    """Total count of a connection, only counted if it is serialized (totalCount)"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __int__(self):
+        if callable(self.count):
+            self.count = self.count()
+        return self.count
+
+
+class KeysetPaginationMixin:
+    """
+    Relay connection field mixin paginating with keyset cursors: the cursors encrypt the sort key values of their node
+    (with a key of SECRET_KEY) and `after`/`before` become WHERE (keys) > (values) seeks instead of OFFSET scans. The
+    pages are fetched without counting the objects, the totalCount of the connection is only counted if requested.
+    Offset cursors of the previous responses are still accepted, paginated by offset. Querysets whose ordering cannot
+    be paginated this way (see get_keyset_ordering) keep offset cursors. Combine it with the connection field of the
+    module:
+
+        class ClaimConnectionField(KeysetPaginationMixin, OrderedDjangoFilterConnectionField):
+            pass
+    """
+
+    @classmethod
+    def resolve_connection(cls, connection, args, iterable, max_limit=None, **kwargs):
+        iterable = maybe_queryset(iterable)
+        ordering = get_keyset_ordering(iterable) if isinstance(iterable, QuerySet) else None
+        if not settings.GRAPHQL_KEYSET_PAGINATION_ENABLED or ordering is None:
+            return super().resolve_connection(connection, args, iterable, max_limit, **kwargs)
+
+        queryset = iterable.order_by(*ordering).annotate(**{
+            f"{ANNOTATION_PREFIX}{index}": F(key.lstrip("-"))
+            for index, key in enumerate(ordering) if key.lstrip("-") != "pk"
+        })
+        cursors = [args[name] for name in ("after", "before") if args.get(name)]
+        if not all(is_keyset_cursor(cursor) for cursor in cursors):
+            # offset cursors of the previous responses, the next ones being keyset cursors
+            result = super().resolve_connection(connection, args, queryset, max_limit, **kwargs)
+            fernet = get_cursor_fernet()
+            for edge in result.edges:
+                edge.cursor = keyset_to_cursor(ordering, get_keyset_values(edge.node, ordering), fernet)
+            if result.edges:
+                result.page_info.start_cursor = result.edges[0].cursor
+                result.page_info.end_cursor = result.edges[-1].cursor
+            return result
+        return cls.resolve_keyset_connection(connection, args, iterable, queryset, ordering, max_limit)
+
+    @classmethod
+    def resolve_keyset_connection(cls, connection, args, iterable, queryset, ordering, max_limit=None):
+        """
+        Page of the connection fetched with one more object than asked to tell whether there are more, instead of
+        counting the objects as graphene-django does. The page info and total count are those of the whole
+        connection, not of the objects after the cursor.
+        """
+        seeks = {name: cursor_to_keyset(args[name], ordering) for name in ("after", "before") if args.get(name)}
+        if "after" in seeks:
+            queryset = queryset.filter(seek_filter(ordering, seeks["after"]))
+        if "before" in seeks:
+            queryset = queryset.filter(seek_filter(ordering, seeks["before"], forward=False))
+        first, last, offset = args.get("first"), args.get("last"), args.get("offset") or 0
+        if first is None and last is None:
+            first = max_limit
+
+        has_previous_page = has_next_page = False
+        if first is not None:
+            nodes = list(queryset[offset:offset + first + 1])
+            has_next_page = len(nodes) > first
+            nodes = nodes[:first]
+        elif offset:
+            nodes = list(queryset[offset:])
+        else:
+            # the last objects, read backwards
+            nodes = list(queryset.reverse()[:last + 1])[::-1]
+        if last is not None:
+            has_previous_page = len(nodes) > last
+            nodes = nodes[max(len(nodes) - last, 0):]
+
+        fernet = get_cursor_fernet()
+        edges = [
+            connection.Edge(node=node, cursor=keyset_to_cursor(ordering, get_keyset_values(node, ordering), fernet))
+            for node in nodes
+        ]
+        result = connection(edges=edges, page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page or "after" in seeks or offset > 0,
+            has_next_page=has_next_page or "before" in seeks,
+        ))
+        result.iterable = iterable
+        # estimated by EstimatedCountMixin if combined
+        get_total_count = getattr(cls, "get_total_count", None)
+        result.length = LazyCount((lambda: get_total_count(iterable, args)) if get_total_count else iterable.count)
+        return result
+
+
+class KeysetConnectionField(KeysetPaginationMixin, DjangoFilterConnectionField):
+    """DjangoFilterConnectionField paginated with keyset cursors"""
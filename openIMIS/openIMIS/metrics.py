@@ -0,0 +1,173 @@
+import ipaddress
+import logging
+import os
+import re
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ModuleNotFoundError:
+    prometheus_client = None
+
+IS_METRICS_ENABLED = getattr(settings, "IS_METRICS_ENABLED", False) and prometheus_client is not None
+
+# Request latencies go from a few milliseconds to minutes for exports
+DURATION_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+# Operation names are chosen by the clients, anything else is reported as "invalid" to bound the label cardinality
+OPERATION_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]{0,63}$")
+
+
+class NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def inc(self, *args, **kwargs):
+        pass
+
+
+def _metric(metric_class, name, documentation, labelnames, **kwargs):
+    if not IS_METRICS_ENABLED:
+        return NoopMetric()
+    return getattr(prometheus_client, metric_class)(name, documentation, labelnames, **kwargs)
+
+
+GRAPHQL_OPERATION_DURATION = _metric(
+    "Histogram", "openimis_graphql_operation_duration_seconds", "GraphQL operation execution time",
+    ["operation_name", "operation_type"], buckets=DURATION_BUCKETS
+)
+GRAPHQL_OPERATION_DB_QUERIES = _metric(
+    "Histogram", "openimis_graphql_operation_db_queries", "SQL statements executed by a GraphQL operation",
+    ["operation_name", "operation_type"], buckets=COUNT_BUCKETS
+)
+GRAPHQL_RESOLVER_DURATION = _metric(
+    "Histogram", "openimis_graphql_resolver_duration_seconds", "Top level resolvers time, in sampled operations",
+    ["field"], buckets=DURATION_BUCKETS
+)
+GRAPHQL_DOCUMENT_CACHE_REQUESTS = _metric(
+    "Counter", "openimis_graphql_document_cache_requests", "Parsed GraphQL documents cache lookups", ["result"]
+)
+CACHE_REQUESTS = _metric(
+    "Counter", "openimis_cache_requests", "Django cache lookups by alias", ["alias", "result"]
+)
+CELERY_TASK_DURATION = _metric(
+    "Histogram", "openimis_celery_task_duration_seconds", "Celery task execution time",
+    ["task", "state"], buckets=DURATION_BUCKETS
+)
+
+
+def operation_label(operation_name):
+    if not operation_name:
+        return "anonymous"
+    if not OPERATION_NAME_PATTERN.match(operation_name):
+        return "invalid"
+    return operation_name
+
+
+class MetricsOperationMiddleware:
+    """Operation middleware measuring the duration and the number of SQL statements of GraphQL operations"""
+
+    def execute(self, next, request, document, operation_name):
+        if not IS_METRICS_ENABLED:
+            return next(request, document, operation_name)
+        labels = (operation_label(operation_name), document.get_operation_type(operation_name) or "unknown")
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                return next(request, document, operation_name)
+        finally:
+            GRAPHQL_OPERATION_DURATION.labels(*labels).observe(time.perf_counter() - start)
+            GRAPHQL_OPERATION_DB_QUERIES.labels(*labels).observe(queries[0])
+
+
+_MISSING = object()
+
+
+class InstrumentedCache:
+    """
+    Cache backend wrapper counting hits and misses of an alias (see settings/metrics.py). Everything but the lookups
+    is delegated to the configured backend.
+    """
+
+    def __init__(self, location, params):
+        params = dict(params)
+        self._alias = params.pop("INSTRUMENTED_ALIAS")
+        self._cache = import_string(params.pop("INSTRUMENTED_BACKEND"))(location, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    def __contains__(self, key):
+        return key in self._cache
+
+    # the extra arguments of the backends (e.g. client of django-redis) are passed through
+    def get(self, key, default=None, *args, **kwargs):
+        value = self._cache.get(key, _MISSING, *args, **kwargs)
+        if value is _MISSING:
+            CACHE_REQUESTS.labels(self._alias, "miss").inc()
+            return default
+        CACHE_REQUESTS.labels(self._alias, "hit").inc()
+        return value
+
+    def get_many(self, keys, *args, **kwargs):
+        keys = list(keys)
+        values = self._cache.get_many(keys, *args, **kwargs)
+        CACHE_REQUESTS.labels(self._alias, "hit").inc(len(values))
+        CACHE_REQUESTS.labels(self._alias, "miss").inc(len(keys) - len(values))
+        return values
+
+
+_task_starts = {}
+
+
+def celery_task_started(task_id):
+    _task_starts[task_id] = time.perf_counter()
+
+
+def celery_task_finished(task_id, task_name, state):
+    start = _task_starts.pop(task_id, None)
+    if start is not None:
+        CELERY_TASK_DURATION.labels(task_name, state or "UNKNOWN").observe(time.perf_counter() - start)
+
+
+def is_metrics_request_allowed(request):
+    """Requests from METRICS_ALLOWED_IPS (addresses or networks) or bearing the METRICS_TOKEN"""
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get("HTTP_AUTHORIZATION", "")
+    if token and constant_time_compare(authorization, f"Bearer {token}"):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request):
+    if not is_metrics_request_allowed(request):
+        return HttpResponseForbidden()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # aggregate the metrics written by all the worker processes
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return HttpResponse(prometheus_client.generate_latest(registry), content_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -0,0 +1,54 @@
+import importlib
+import logging
+import time
+
+from .openimisapps import OPTIONAL_SUBMODULES, has_submodule, openimis_apps
+
+logger = logging.getLogger(__name__)
+
+
+class ModuleRegistry:
+    """
+    Hook submodules of the modules (OPTIONAL_SUBMODULES: schema, signals, receivers, scheduled_tasks, urls, routing),
+    found in a single pass by the module manifest and imported once for all their consumers. The import time of each
+    hook is recorded, including the modules it imports first (see the module_startup_report command).
+    """
+
+    def __init__(self):
+        self._submodules = {}
+        self.import_times = {}
+
+    def get_submodule(self, app, submodule):
+        """The hook submodule of a module, None if it has none. Import errors are raised to the consumer."""
+        key = (app, submodule)
+        if key not in self._submodules:
+            if not has_submodule(app, submodule):
+                self._submodules[key] = None
+                return None
+            start = time.perf_counter()
+            module = importlib.import_module(f"{app}.{submodule}")
+            self.import_times[key] = time.perf_counter() - start
+            logger.debug(f"{app}.{submodule} imported in {self.import_times[key] * 1000:.1f} ms")
+            self._submodules[key] = module
+        return self._submodules[key]
+
+    def get_submodules(self, submodule, apps=None):
+        """(module, hook submodule) of the modules having it, in the dependency order of the modules"""
+        for app in openimis_apps() if apps is None else apps:
+            module = self.get_submodule(app, submodule)
+            if module is not None:
+                yield app, module
+
+    def import_all(self, apps=None):
+        """Imports every hook of the modules, answering the errors by (module, submodule)"""
+        errors = {}
+        for app in openimis_apps() if apps is None else apps:
+            for submodule in OPTIONAL_SUBMODULES:
+                try:
+                    self.get_submodule(app, submodule)
+                except Exception as exc:
+                    errors[(app, submodule)] = exc
+        return errors
+
+
+module_registry = ModuleRegistry()
@@ -1,6 +1,5 @@
 import os
 import logging
-from importlib import resources
 
 from .openimisconf import load_openimis_conf
 
@@ -12,7 +11,7 @@ def extract_app(module):
 
 def openimis_apps():
     OPENIMIS_CONF = load_openimis_conf()
-    return order_modules([*map(extract_app, OPENIMIS_CONF["modules"])])
+    return list(get_module_manifest([*map(extract_app, OPENIMIS_CONF["modules"])])["modules"])
 
 
 def get_locale_folders():
@@ -22,10 +21,10 @@ def get_locale_folders():
     apps = []
     basedirs = []
     for mod_name in openimis_apps():
-        try:
-            with resources.path(mod_name, "__init__.py") as path:
-                apps.append(path.parent.parent)
-        except ModuleNotFoundError:
+        path = get_module_path(mod_name)
+        if path:
+            apps.append(os.path.dirname(path))
+        else:
             logger.error(f"Module \"{mod_name}\" not found.")
 
     for topdir in ["."] + apps:
@@ -36,9 +35,17 @@ def get_locale_folders():
     return basedirs
 
 import importlib
+import importlib.machinery
+import importlib.util
 import os
 import ast
+import functools
+import hashlib
+import json
+import sys
+import tempfile
 import warnings
+from importlib import metadata
 from typing import List, Dict, Set
 
 def clean_name(name):
@@ -64,6 +71,19 @@ def find_module_path(module_name: str):
         return None
     
     
+def find_setup_py(module_path: str):
+    """
+    Find the setup.py of a module installed from its sources, None for the modules installed from a wheel.
+    """
+    setup_path = os.path.join(module_path, "setup.py")
+    if not os.path.exists(setup_path):
+        # Fallback: Check parent directory (e.g., editable installs)
+        setup_path = os.path.join(os.path.dirname(module_path), "setup.py")
+        if not os.path.exists(setup_path):
+            return None
+    return setup_path
+
+
 def extract_dependencies_from_setup_py(module_name: str, module_list: Set[str]) -> List[str]:
     """
     Extract dependencies from a module's setup.py that are also in the module_list.
@@ -74,12 +94,9 @@ def extract_dependencies_from_setup_py(module_name: str, module_list: Set[str])
     if not module_path:
         return []
     
-    setup_path = os.path.join(module_path, "setup.py")
-    if not os.path.exists(setup_path):
-        # Fallback: Check parent directory (e.g., editable installs)
-        setup_path = os.path.join(os.path.dirname(module_path), "setup.py")
-        if not os.path.exists(setup_path):
-            return []
+    setup_path = find_setup_py(module_path)
+    if not setup_path:
+        return []
     
     try:
         with open(setup_path, "r") as f:
@@ -152,4 +169,186 @@ def order_modules(module_list: List[str]) -> List[str]:
                 if module_name in other_module["dependencies"]:
                     other_module["dependencies"].remove(module_name)
     
-    return ordered_modules
\ No newline at end of file
+    return ordered_modules
+
+
+# Ordering the modules reads the setup.py of each of them: the order, paths and optional submodules of the modules are
+# kept in a manifest, built once (python manage.py build_module_manifest in the image) and read by every process.
+MANIFEST_VERSION = 2
+# submodules of the modules looked up by the assembly at startup
+OPTIONAL_SUBMODULES = ("schema", "signals", "receivers", "scheduled_tasks", "urls", "routing")
+DEFAULT_MANIFEST_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "openimis-modules.json"
+)
+
+_manifests = {}
+
+
+def get_manifest_path():
+    return os.environ.get("OPENIMIS_MODULE_MANIFEST", DEFAULT_MANIFEST_PATH)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_packages_distributions():
+    # reads every installed distribution, only when a module is not openimis-be-<module>
+    return metadata.packages_distributions()
+
+
+def find_module_distribution(module_name: str):
+    """
+    Distribution installing a module: openimis-be-<module> or the one actually installing its package, never a
+    distribution merely named like the package (an unrelated PyPI project). None if it is not installed as one.
+    """
+    try:
+        return metadata.distribution(f"openimis-be-{module_name}")
+    except metadata.PackageNotFoundError:
+        pass
+    for name in _get_packages_distributions().get(module_name, []):
+        try:
+            return metadata.distribution(name)
+        except metadata.PackageNotFoundError:
+            continue
+    return None
+
+
+def get_module_metadata_file(module_name: str):
+    """
+    METADATA (or PKG-INFO) file of the distribution of a module: rewritten by every install, its mtime tells whether
+    the module was upgraded or reinstalled.
+    """
+    distribution = find_module_distribution(module_name)
+    for file in (distribution.files or []) if distribution else []:
+        if file.name in ("METADATA", "PKG-INFO") and file.parent.name.endswith((".dist-info", ".egg-info")):
+            return str(distribution.locate_file(file))
+    return None
+
+
+def _get_mtime(path: str):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_manifest_fingerprint(module_list: List[str], paths: List[str]) -> str:
+    """
+    Hash of what the manifest is built from: the modules of openimis.json and the modification times of the METADATA
+    of their distributions (rewritten on every install), of the setup.py of those installed from their sources and of
+    their directories (modified when submodules are added or removed). Only stats, checked by every process.
+    """
+    state = [
+        MANIFEST_VERSION,
+        sys.prefix,
+        module_list,
+        [[path, _get_mtime(path)] for path in paths],
+    ]
+    return hashlib.sha256(json.dumps(state).encode("utf-8")).hexdigest()
+
+
+def _has_submodule_source(module_path: str, submodule: str) -> bool:
+    if os.path.exists(os.path.join(module_path, f"{submodule}.py")) \
+            or os.path.exists(os.path.join(module_path, submodule, "__init__.py")):
+        return True
+    # compiled only modules (.pyc, extensions), looked up in the directory of the module without importing it
+    return importlib.machinery.PathFinder.find_spec(submodule, [module_path]) is not None
+
+
+def _get_fingerprint_paths(manifest: Dict) -> List[str]:
+    return [
+        *manifest["setup_files"],
+        *(path for path in manifest["metadata_files"].values() if path),
+        *(path for path in manifest["paths"].values() if path),
+    ]
+
+
+def build_module_manifest(module_list: List[str]) -> Dict:
+    ordered_modules = order_modules(list(module_list))
+    modules = {}
+    for module in ordered_modules:
+        module_path = find_module_path(module)
+        modules[module] = {
+            "path": module_path,
+            "setup_py": find_setup_py(module_path) if module_path else None,
+            "submodules": [
+                submodule for submodule in OPTIONAL_SUBMODULES
+                if module_path and _has_submodule_source(module_path, submodule)
+            ],
+        }
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "conf_modules": module_list,
+        "modules": ordered_modules,
+        "setup_files": [module["setup_py"] for module in modules.values() if module["setup_py"]],
+        "metadata_files": {module: get_module_metadata_file(module) for module in ordered_modules},
+        "paths": {module: entry["path"] for module, entry in modules.items()},
+        "submodules": {module: entry["submodules"] for module, entry in modules.items()},
+    }
+    manifest["fingerprint"] = get_manifest_fingerprint(module_list, _get_fingerprint_paths(manifest))
+    return manifest
+
+
+def read_module_manifest(module_list: List[str]):
+    """The manifest of the modules, None if it is missing or out of date"""
+    manifest_path = get_manifest_path()
+    if not manifest_path:
+        return None
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != MANIFEST_VERSION or manifest.get("conf_modules") != module_list:
+        return None
+    fingerprint = get_manifest_fingerprint(module_list, _get_fingerprint_paths(manifest))
+    if manifest.get("fingerprint") != fingerprint:
+        logger.info("Module manifest out of date, rebuilding it")
+        return None
+    return manifest
+
+
+def write_module_manifest(module_list: List[str]) -> Dict:
+    manifest = build_module_manifest(module_list)
+    manifest_path = get_manifest_path()
+    if manifest_path:
+        temp_path = None
+        try:
+            # a temporary file of its own, the workers starting together writing the manifest concurrently
+            with tempfile.NamedTemporaryFile(
+                "w", dir=os.path.dirname(manifest_path), suffix=".part", delete=False
+            ) as manifest_file:
+                temp_path = manifest_file.name
+                json.dump(manifest, manifest_file, indent=2)
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, manifest_path)
+        except OSError as exc:
+            # read only deployments order the modules on every start
+            logger.debug(f"Could not write the module manifest {manifest_path}: {exc}")
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+    return manifest
+
+
+def get_module_manifest(module_list: List[str]) -> Dict:
+    """Manifest of the modules, read once per process and rebuilt when out of date"""
+    key = tuple(module_list)
+    if key not in _manifests:
+        _manifests[key] = read_module_manifest(module_list) or write_module_manifest(module_list)
+    return _manifests[key]
+
+
+def get_module_path(module_name: str):
+    """Directory of a module of openimis.json, None if it is not installed"""
+    return openimis_manifest()["paths"].get(module_name)
+
+
+def has_submodule(module_name: str, submodule: str) -> bool:
+    """Whether a module of openimis.json has an OPTIONAL_SUBMODULES submodule, without importing it"""
+    manifest = openimis_manifest()
+    if module_name not in manifest["submodules"] or submodule not in OPTIONAL_SUBMODULES:
+        return importlib.util.find_spec(f"{module_name}.{submodule}") is not None
+    return submodule in manifest["submodules"][module_name]
+
+
+def openimis_manifest() -> Dict:
+    OPENIMIS_CONF = load_openimis_conf()
+    return get_module_manifest([*map(extract_app, OPENIMIS_CONF["modules"])])
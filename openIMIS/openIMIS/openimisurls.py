@@ -1,13 +1,17 @@
 from django.urls import include, path
 
+from .module_registry import module_registry
 from .openimisconf import load_openimis_conf
 from .settings import SITE_ROOT
 
 
 def extract_url(module):
-    return path('%s%s/' % (SITE_ROOT(), module["name"]), include('%s.urls' % module["name"]))
+    urls = module_registry.get_submodule(module["name"], "urls")
+    if urls is None:
+        return None
+    return path('%s%s/' % (SITE_ROOT(), module["name"]), include(urls))
 
 
 def openimis_urls():
     OPENIMIS_CONF = load_openimis_conf()
-    return [*map(extract_url, OPENIMIS_CONF["modules"])]
+    return [url for url in map(extract_url, OPENIMIS_CONF["modules"]) if url]
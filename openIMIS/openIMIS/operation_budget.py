@@ -0,0 +1,108 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class OperationBudgetExceeded(Exception):
+    pass
+
+
+def variables_shape(value):
+    """Structure of the variables with their types instead of their values, safe to log"""
+    if isinstance(value, dict):
+        return {key: variables_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [variables_shape(value[0])] if value else []
+    if value is None:
+        return None
+    return type(value).__name__
+
+
+class OperationUsage:
+    """SQL statements and time used by an operation, recorded through a connection execute wrapper"""
+
+    def __init__(self, enforce=False):
+        self.enforce = enforce
+        self.queries = 0
+        self.sql_time = 0.0
+        self.rejected = 0
+        self.exceeded = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.enforce:
+            self.check_sql_budget()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+    def check_sql_budget(self):
+        """Stops the statements once a budget is spent, which is then marked as exceeded"""
+        if settings.GRAPHQL_OPERATION_MAX_QUERIES and self.queries >= settings.GRAPHQL_OPERATION_MAX_QUERIES:
+            self._reject("queries", f"{settings.GRAPHQL_OPERATION_MAX_QUERIES} SQL queries")
+        if settings.GRAPHQL_OPERATION_MAX_SQL_TIME_MS \
+                and self.sql_time * 1000 >= settings.GRAPHQL_OPERATION_MAX_SQL_TIME_MS:
+            self._reject("sql_time", f"{settings.GRAPHQL_OPERATION_MAX_SQL_TIME_MS} ms of SQL time")
+
+    def _reject(self, budget, description):
+        self.rejected += 1
+        if budget not in self.exceeded:
+            self.exceeded.append(budget)
+        raise OperationBudgetExceeded(f"The operation exceeded its budget of {description}.")
+
+    def exceeded_budgets(self, duration):
+        exceeded = list(self.exceeded)
+        if settings.GRAPHQL_OPERATION_MAX_QUERIES and self.queries > settings.GRAPHQL_OPERATION_MAX_QUERIES \
+                and "queries" not in exceeded:
+            exceeded.append("queries")
+        if settings.GRAPHQL_OPERATION_MAX_SQL_TIME_MS \
+                and self.sql_time * 1000 > settings.GRAPHQL_OPERATION_MAX_SQL_TIME_MS and "sql_time" not in exceeded:
+            exceeded.append("sql_time")
+        if settings.GRAPHQL_OPERATION_MAX_TIME_MS and duration * 1000 > settings.GRAPHQL_OPERATION_MAX_TIME_MS:
+            exceeded.append("time")
+        return exceeded
+
+
+class OperationBudgetOperationMiddleware:
+    """
+    Measures the SQL statements, SQL time and wall time of every operation and logs a structured record when one of
+    GRAPHQL_OPERATION_MAX_QUERIES, GRAPHQL_OPERATION_MAX_SQL_TIME_MS or GRAPHQL_OPERATION_MAX_TIME_MS is exceeded.
+    The resolver hot spots are the slow resolvers and repeated statements collected when the operation was sampled by
+    the tracer or the SQL diagnostics. With GRAPHQL_OPERATION_BUDGET_ENFORCE, SQL statements beyond the budgets fail.
+    """
+
+    def execute(self, next, request, document, operation_name):
+        usage = OperationUsage(enforce=settings.GRAPHQL_OPERATION_BUDGET_ENFORCE)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(usage):
+                return next(request, document, operation_name)
+        finally:
+            self.log_exceeded_budgets(request, document, operation_name, usage, time.perf_counter() - start)
+
+    def log_exceeded_budgets(self, request, document, operation_name, usage, duration):
+        exceeded = usage.exceeded_budgets(duration)
+        if exceeded:
+            record = {
+                "operation_name": operation_name,
+                "operation_type": document.get_operation_type(operation_name),
+                "exceeded": exceeded,
+                "variables": variables_shape(getattr(request, "graphql_variables", None)),
+                "queries": usage.queries,
+                "rejected_queries": usage.rejected,
+                "sql_time_ms": round(usage.sql_time * 1000, 2),
+                "time_ms": round(duration * 1000, 2),
+                "query_cost": getattr(getattr(request, "graphql_query_cost", None), "cost", None),
+                "user": getattr(getattr(request, "user", None), "id", None),
+                "slow_resolvers": getattr(request, "slow_resolvers", None) or [],
+                "repeated_sql": getattr(request, "sql_diagnostics_report", None) or [],
+            }
+            logger.warning("GraphQL operation over budget: %s", json.dumps(record, default=str),
+                           extra={"graphql_operation": record})
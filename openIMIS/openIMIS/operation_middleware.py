@@ -0,0 +1,119 @@
+import logging
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.utils.module_loading import import_string
+from graphql.error import GraphQLLocatedError
+from graphql.execution import ExecutionResult
+from graphql.language import ast
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.middleware import JSONWebTokenMiddleware
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.utils import get_http_authorization
+
+logger = logging.getLogger(__name__)
+
+MIDDLEWARE_OPERATION_FUNCTION = "execute"
+# set on the requests executed through GRAPHQL_OPERATION_MIDDLEWARE
+OPERATION_CHAIN_ATTRIBUTE = "graphql_operation_chain"
+
+_operation_middlewares = None
+
+
+def get_operation_middlewares():
+    """
+    Instances of GRAPHQL_OPERATION_MIDDLEWARE, created once per process. Contrary to GRAPHENE["MIDDLEWARE"], which
+    wraps every field resolver, these are called once per operation with:
+    execute(next, request, document, operation_name) -> ExecutionResult
+    """
+    global _operation_middlewares
+    if _operation_middlewares is None:
+        _operation_middlewares = [import_string(path)() for path in settings.GRAPHQL_OPERATION_MIDDLEWARE]
+    return _operation_middlewares
+
+
+def operation_middleware_chain(execute, middlewares):
+    handler = execute
+    for middleware in reversed(middlewares):
+        handler = partial(getattr(middleware, MIDDLEWARE_OPERATION_FUNCTION), handler)
+    return handler
+
+
+def get_root_fields(document, operation_name):
+    for definition in document.document_ast.definitions:
+        if not isinstance(definition, ast.OperationDefinition):
+            continue
+        if operation_name and (not definition.name or definition.name.value != operation_name):
+            continue
+        return definition.operation, definition.selection_set.selections
+    return None, []
+
+
+class JSONWebTokenOperationMiddleware:
+    """
+    Authenticates the JWT of the request once per operation instead of graphql_jwt.middleware.JSONWebTokenMiddleware
+    checking it on every field. Only the authorization header and cookie are supported: with JWT_ALLOW_ARGUMENT, the
+    per field middleware is still required.
+    """
+
+    def execute(self, next, request, document, operation_name):
+        is_anonymous = not hasattr(request, "user") or request.user.is_anonymous
+        if is_anonymous and get_http_authorization(request) is not None \
+                and not self.allow_any(request, document, operation_name):
+            try:
+                user = authenticate(request=request)
+            except JSONWebTokenError as exc:
+                return ExecutionResult(errors=[GraphQLLocatedError(None, original_error=exc)])
+            if user is not None:
+                request.user = user
+        return next(request, document, operation_name)
+
+    def allow_any(self, request, document, operation_name):
+        """
+        Same rule as graphql_jwt.middleware.allow_any, applied to the whole operation: it is only allowed without a
+        valid token if all its root fields are JWT_ALLOW_ANY_CLASSES.
+        """
+        operation_type, root_fields = get_root_fields(document, operation_name)
+        if not operation_type or not root_fields:
+            return False
+        root_type = document.schema.get_type(operation_type.title())
+        if root_type is None:
+            return False
+        allowed_classes = tuple(jwt_settings.JWT_ALLOW_ANY_CLASSES)
+        for selection in root_fields:
+            if not isinstance(selection, ast.Field):
+                return False
+            field = root_type.fields.get(selection.name.value)
+            graphene_type = getattr(field.type, "graphene_type", None) if field else None
+            if graphene_type is None or not issubclass(graphene_type, allowed_classes):
+                return False
+        return True
+
+
+class OperationFallbackMiddleware(JSONWebTokenMiddleware):
+    """
+    Field middleware authenticating the JWT and activating the user language for the executions that do not go
+    through GRAPHQL_OPERATION_MIDDLEWARE (other views, schema.execute in the tests of the modules), as
+    graphql_jwt.middleware.JSONWebTokenMiddleware and GQLUserLanguageMiddleware did. Left out of the field middleware
+    chain of OpenIMISGraphQLView, which runs the operation middleware.
+    """
+
+    def is_enabled(self, request):
+        return not getattr(request, OPERATION_CHAIN_ATTRIBUTE, False)
+
+    def resolve(self, next, root, info, **kwargs):
+        context = info.context
+        if getattr(context, OPERATION_CHAIN_ATTRIBUTE, False):
+            return next(root, info, **kwargs)
+
+        def resolve_in_user_language(root, info, **kwargs):
+            from .schema import activate_user_language
+
+            if not getattr(context, "graphql_language_activated", False):
+                activate_user_language(getattr(context, "user", None))
+                if hasattr(context, "__dict__"):
+                    context.graphql_language_activated = True
+            return next(root, info, **kwargs)
+
+        return super().resolve(resolve_in_user_language, root, info, **kwargs)
@@ -0,0 +1,254 @@
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from graphql.error import GraphQLError
+from graphql.language.base import parse
+from graphql.validation import validate
+
+from .document_cache import document_backend, query_hash
+
+logger = logging.getLogger(__name__)
+
+APQ_VERSION = 1
+
+
+class PersistedQueryError(GraphQLError):
+    code = None
+    # invalid errors are answered with a 400 status, the others with 200 as the client is expected to retry
+    invalid = False
+
+    def __init__(self, message):
+        super().__init__(message, extensions={"code": self.code})
+
+
+class PersistedQueryNotFound(PersistedQueryError):
+    code = "PERSISTED_QUERY_NOT_FOUND"
+
+    def __init__(self):
+        # Apollo clients look for this exact message to retry with the full query text
+        super().__init__("PersistedQueryNotFound")
+
+
+class PersistedQueryNotSupported(PersistedQueryError):
+    code = "PERSISTED_QUERY_NOT_SUPPORTED"
+
+    def __init__(self):
+        super().__init__("PersistedQueryNotSupported")
+
+
+class PersistedQueryInvalid(PersistedQueryError):
+    code = "PERSISTED_QUERY_INVALID"
+    invalid = True
+
+
+class PersistedQueryStore:
+    """
+    Maps sha256 hashes to query texts for the automatic persisted queries (APQ) protocol.
+    """
+    key_prefix = "apq"
+
+    def __init__(self, cache_alias, timeout):
+        self.cache_alias = cache_alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_key(self, sha256_hash):
+        return f"{self.key_prefix}:{sha256_hash}"
+
+    def get(self, sha256_hash):
+        return self.cache.get(self.get_key(sha256_hash))
+
+    def set(self, sha256_hash, query):
+        self.cache.set(self.get_key(sha256_hash), query, self.timeout)
+
+
+persisted_query_store = PersistedQueryStore(settings.GRAPHQL_APQ_CACHE, settings.GRAPHQL_APQ_TTL)
+
+
+def get_persisted_query_extension(request, data):
+    extensions = request.GET.get("extensions") or data.get("extensions")
+    if not extensions:
+        return None
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise PersistedQueryInvalid("Extensions are invalid JSON.")
+    if not isinstance(extensions, dict):
+        return None
+    return extensions.get("persistedQuery")
+
+
+def resolve_persisted_query(request, data, query):
+    """
+    Returns the query text to execute for the request, following the APQ protocol:
+    - hash only: the query is looked up in the store, PersistedQueryNotFound tells the client to send it in full
+    - hash and query: the hash is checked against the query, which is then registered in the store
+    Requests without the persistedQuery extension are returned untouched.
+    """
+    persisted_query = get_persisted_query_extension(request, data)
+    if not persisted_query:
+        return query
+    if not settings.GRAPHQL_APQ_ENABLED:
+        raise PersistedQueryNotSupported()
+    if persisted_query.get("version") != APQ_VERSION:
+        raise PersistedQueryInvalid(f"Unsupported persisted query version: {persisted_query.get('version')}")
+    sha256_hash = persisted_query.get("sha256Hash")
+    if not sha256_hash or not isinstance(sha256_hash, str):
+        raise PersistedQueryInvalid("Persisted query sha256Hash is missing.")
+
+    if not query:
+        query = persisted_query_store.get(sha256_hash)
+        if query is None:
+            raise PersistedQueryNotFound()
+        return query
+
+    if query_hash(query) != sha256_hash:
+        raise PersistedQueryInvalid("Provided sha256Hash does not match query.")
+    persisted_query_store.set(sha256_hash, query)
+    return query
+
+
+class PersistedQueryNotAllowed(PersistedQueryError):
+    code = "PERSISTED_QUERY_NOT_ALLOWED"
+    invalid = True
+
+    def __init__(self):
+        super().__init__("Only registered persisted queries are allowed.")
+
+
+def read_persisted_queries(path):
+    """
+    Reads a persisted queries manifest, either a {sha256: query} mapping or an Apollo style
+    {"operations": [{"id": sha256, "body": query}, ...]} manifest, as produced by the front-end build.
+    """
+    with open(path) as manifest_file:
+        manifest = json.load(manifest_file)
+    if isinstance(manifest, dict) and isinstance(manifest.get("operations"), list):
+        return {operation["id"]: operation["body"] for operation in manifest["operations"]}
+    return manifest
+
+
+def write_persisted_queries(path, queries):
+    with open(path, "w") as manifest_file:
+        json.dump(queries, manifest_file, indent=2, sort_keys=True)
+
+
+class PersistedQueryAllowlist:
+    """
+    Registered operations, parsed and validated once per process, when the apps are ready (see
+    SignalBindingConfig.load_persisted_queries) or else when first used. The problems of the file are kept in errors.
+    Documents are indexed by query text: the text returned by get_query() is the very string object used as key,
+    so the lookup in document_from_string does not even need to hash it again.
+    """
+
+    def __init__(self, path, backend):
+        self.path = path
+        self.backend = backend
+        self._queries = None
+        self._documents = None
+        self._lock = threading.Lock()
+        self.errors = []
+
+    def build_document(self, schema, query):
+        document_ast = parse(query)
+        validation_errors = validate(schema, document_ast)
+        if validation_errors:
+            raise validation_errors[0]
+        return self.backend.build_document(schema, query, document_ast, validation_errors)
+
+    def load(self, schema):
+        if self._documents is not None:
+            return
+        with self._lock:
+            if self._documents is not None:
+                return
+            queries = {}
+            documents = {}
+            errors = []
+            try:
+                manifest = read_persisted_queries(self.path)
+            except FileNotFoundError:
+                errors.append(f"Persisted queries file {self.path} not found, all operations will be rejected")
+                manifest = {}
+            except ValueError as exc:
+                errors.append(f"Persisted queries file {self.path} is not valid JSON, all operations will be "
+                              f"rejected: {exc}")
+                manifest = {}
+            for sha256_hash, query in manifest.items():
+                try:
+                    document = self.build_document(schema, query)
+                except Exception as exc:
+                    errors.append(f"Persisted query {sha256_hash} is not valid: {exc}")
+                    continue
+                queries[sha256_hash] = query
+                documents[query] = document
+            for error in errors:
+                logger.error(error)
+            self.errors = errors
+            self._queries = queries
+            self._documents = documents
+            logger.info(f"{len(documents)} persisted queries loaded from {self.path}")
+
+    def reset(self):
+        with self._lock:
+            self._queries = None
+            self._documents = None
+            self.errors = []
+
+    def get_query(self, schema, sha256_hash=None, query=None):
+        self.load(schema)
+        if sha256_hash:
+            registered = self._queries.get(sha256_hash)
+            if registered is None or (query and query != registered):
+                raise PersistedQueryNotAllowed()
+            return registered
+        if query in self._documents:
+            return query
+        raise PersistedQueryNotAllowed()
+
+    def document_from_string(self, schema, query):
+        self.load(schema)
+        document = self._documents.get(query)
+        if document is None:
+            raise PersistedQueryNotAllowed()
+        return document
+
+
+def resolve_allowed_query(schema, request, data, query):
+    """
+    Allowlist mode: the operation is looked up by its persistedQuery hash or, for clients that still send the
+    full text, by the text itself. Anything else is rejected before parsing.
+    """
+    persisted_query = get_persisted_query_extension(request, data) or {}
+    sha256_hash = persisted_query.get("sha256Hash")
+    return persisted_query_allowlist.get_query(schema, sha256_hash=sha256_hash, query=query)
+
+
+persisted_query_allowlist = PersistedQueryAllowlist(
+    settings.GRAPHQL_PERSISTED_QUERIES_FILE, document_backend
+)
+
+
+def check_persisted_queries(app_configs, **kwargs):
+    """
+    In persisted queries only mode, the registered operations must all load against the schema: the others are
+    rejected. Warnings rather than errors, not to block register_persisted_queries or the migrations.
+    """
+    if not settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+        return []
+    from graphene_django.settings import graphene_settings
+
+    persisted_query_allowlist.load(graphene_settings.SCHEMA)
+    return [
+        checks.Warning(error, hint="Register the operations again with manage.py register_persisted_queries.",
+                       id="openIMIS.W001")
+        for error in persisted_query_allowlist.errors
+    ]
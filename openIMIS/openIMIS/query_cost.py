@@ -0,0 +1,199 @@
+import logging
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from graphene_django.settings import graphene_settings
+from graphql.error import GraphQLError
+from graphql.language import ast
+from graphql.type.definition import GraphQLList, GraphQLNonNull, get_named_type
+
+logger = logging.getLogger(__name__)
+
+QueryCost = namedtuple("QueryCost", ["depth", "cost"])
+
+PAGE_SIZE_ARGUMENTS = ("first", "last")
+
+
+class QueryCostError(GraphQLError):
+    code = None
+
+    def __init__(self, message, query_cost):
+        super().__init__(message, extensions={"code": self.code, "depth": query_cost.depth, "cost": query_cost.cost})
+
+
+class QueryTooComplex(QueryCostError):
+    code = "QUERY_TOO_COMPLEX"
+
+
+class QueryQueueTimeout(QueryCostError):
+    code = "QUERY_QUEUE_TIMEOUT"
+
+
+def _is_connection(graphql_type):
+    fields = getattr(graphql_type, "fields", None)
+    return bool(fields) and "edges" in fields and "pageInfo" in fields
+
+
+def _is_list(graphql_type):
+    if isinstance(graphql_type, GraphQLNonNull):
+        graphql_type = graphql_type.of_type
+    return isinstance(graphql_type, GraphQLList)
+
+
+def _argument_value(value, variables):
+    if isinstance(value, ast.Variable):
+        return variables.get(value.name.value)
+    if isinstance(value, ast.IntValue):
+        return int(value.value)
+    return None
+
+
+class QueryCostAnalyzer:
+    """
+    Static estimation of the work an operation requires, before it is executed.
+    Every resolved field costs one per parent object; connections multiply the cost of their selection by their page
+    size: the `first`/`last` argument or, when missing, RELAY_CONNECTION_MAX_LIMIT (which also caps the arguments).
+    The root connections of streamed queries (see ConnectionStream) count root_page_size objects instead, plain lists
+    list_size objects. The cost of a fragment is computed once per type, multiplier and depth it is spread at.
+    """
+
+    def __init__(self, schema, document_ast, variables=None, max_page_size=None, root_page_size=None, list_size=1):
+        self.schema = schema
+        self.variables = variables or {}
+        self.max_page_size = max_page_size
+        self.root_page_size = root_page_size
+        self.list_size = max(list_size, 1)
+        self.fragment_costs = {}
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+        self.operations = [
+            definition for definition in document_ast.definitions
+            if isinstance(definition, ast.OperationDefinition)
+        ]
+
+    def get_operation(self, operation_name):
+        if not operation_name and len(self.operations) == 1:
+            return self.operations[0]
+        for operation in self.operations:
+            if operation.name and operation.name.value == operation_name:
+                return operation
+        return None
+
+    def analyze(self, operation_name=None):
+        operation = self.get_operation(operation_name)
+        if operation is None:
+            return QueryCost(0, 0)
+        if operation.operation == "mutation":
+            root_type = self.schema.get_mutation_type()
+        elif operation.operation == "subscription":
+            root_type = self.schema.get_subscription_type()
+        else:
+            root_type = self.schema.get_query_type()
+        return self._selection_set_cost(root_type, operation.selection_set, 1, 0, set())
+
+    def page_size(self, field):
+        page_size = None
+        for argument in field.arguments or []:
+            if argument.name.value in PAGE_SIZE_ARGUMENTS:
+                value = _argument_value(argument.value, self.variables)
+                if isinstance(value, int):
+                    page_size = value if page_size is None else max(page_size, value)
+        if page_size is None:
+            page_size = self.max_page_size or 1
+        elif self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        return max(page_size, 1)
+
+    def _selection_set_cost(self, parent_type, selection_set, multiplier, depth, visited_fragments):
+        max_depth = depth
+        cost = 0
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                field_depth, field_cost = self._field_cost(
+                    parent_type, selection, multiplier, depth, visited_fragments
+                )
+            elif isinstance(selection, ast.FragmentSpread):
+                name = selection.name.value
+                fragment = self.fragments.get(name)
+                if fragment is None or name in visited_fragments:
+                    continue
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value) or parent_type
+                # repeated spreads of nested fragments would otherwise be walked an exponential number of times
+                memo_key = (name, str(fragment_type), multiplier, depth)
+                if memo_key not in self.fragment_costs:
+                    self.fragment_costs[memo_key] = self._selection_set_cost(
+                        fragment_type, fragment.selection_set, multiplier, depth, visited_fragments | {name}
+                    )
+                field_depth, field_cost = self.fragment_costs[memo_key]
+            elif isinstance(selection, ast.InlineFragment):
+                fragment_type = parent_type
+                if selection.type_condition:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value) or parent_type
+                field_depth, field_cost = self._selection_set_cost(
+                    fragment_type, selection.selection_set, multiplier, depth, visited_fragments
+                )
+            else:
+                continue
+            max_depth = max(max_depth, field_depth)
+            cost += field_cost
+        return QueryCost(max_depth, cost)
+
+    def _field_cost(self, parent_type, field, multiplier, depth, visited_fragments):
+        if not field.selection_set:
+            return QueryCost(depth + 1, multiplier)
+        fields = getattr(parent_type, "fields", None) or {}
+        field_def = fields.get(field.name.value)
+        field_type = get_named_type(field_def.type) if field_def else None
+        child_multiplier = multiplier
+        if _is_connection(field_type):
+            page_size = self.root_page_size if depth == 0 and self.root_page_size is not None else None
+            child_multiplier = multiplier * (page_size or self.page_size(field))
+        elif field_def and _is_list(field_def.type):
+            child_multiplier = multiplier * self.list_size
+        child_depth, child_cost = self._selection_set_cost(
+            field_type, field.selection_set, child_multiplier, depth + 1, visited_fragments
+        )
+        return QueryCost(child_depth, multiplier + child_cost)
+
+
+def analyze_query_cost(schema, document_ast, operation_name=None, variables=None, root_page_size=None):
+    return QueryCostAnalyzer(
+        schema, document_ast, variables=variables, max_page_size=graphene_settings.RELAY_CONNECTION_MAX_LIMIT,
+        root_page_size=root_page_size, list_size=settings.GRAPHQL_QUERY_COST_LIST_SIZE,
+    ).analyze(operation_name)
+
+
+def check_query_cost(query_cost):
+    if settings.GRAPHQL_MAX_QUERY_DEPTH and query_cost.depth > settings.GRAPHQL_MAX_QUERY_DEPTH:
+        raise QueryTooComplex(
+            f"Query depth {query_cost.depth} exceeds the maximum of {settings.GRAPHQL_MAX_QUERY_DEPTH}.", query_cost
+        )
+    if settings.GRAPHQL_MAX_QUERY_COST and query_cost.cost > settings.GRAPHQL_MAX_QUERY_COST:
+        raise QueryTooComplex(
+            f"Query cost {query_cost.cost} exceeds the maximum of {settings.GRAPHQL_MAX_QUERY_COST}.", query_cost
+        )
+
+
+_heavy_query_slots = threading.BoundedSemaphore(max(settings.GRAPHQL_HEAVY_QUERY_CONCURRENCY, 1))
+
+
+@contextmanager
+def admit_query(query_cost):
+    """
+    Operations above GRAPHQL_HEAVY_QUERY_COST wait for one of the GRAPHQL_HEAVY_QUERY_CONCURRENCY slots of the worker
+    so that a few expensive queries can't take all the threads and database connections.
+    """
+    if not settings.GRAPHQL_HEAVY_QUERY_COST or query_cost.cost <= settings.GRAPHQL_HEAVY_QUERY_COST:
+        yield
+        return
+    if not _heavy_query_slots.acquire(timeout=settings.GRAPHQL_HEAVY_QUERY_QUEUE_TIMEOUT):
+        raise QueryQueueTimeout("Too many expensive queries are running, please retry later.", query_cost)
+    try:
+        yield
+    finally:
+        _heavy_query_slots.release()
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import translation
+from graphql.execution import ExecutionResult
+from graphql.language import ast
+
+from .document_cache import query_hash
+from .operation_middleware import get_root_fields
+
+logger = logging.getLogger(__name__)
+
+# caches local to a process, not shared with the other workers
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def get_cache_backend(alias):
+    """Backend of a CACHES alias, the one wrapped by InstrumentedCache when the metrics instrument the caches"""
+    cache_settings = settings.CACHES.get(alias, {})
+    return cache_settings.get("INSTRUMENTED_BACKEND") or cache_settings.get("BACKEND")
+
+
+class CacheTags:
+    """
+    Versions of the model tags ("app_label.Model") of the cached values. The versions are part of the cache keys, so
+    invalidating a tag is a matter of changing its version: the entries computed with the previous one are never
+    read again and expire with their ttl.
+    """
+    key_prefix = "tag"
+
+    def __init__(self, cache_alias):
+        self.cache_alias = cache_alias
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get_key(self, tag):
+        return f"{self.key_prefix}:{tag}"
+
+    def versions(self, tags):
+        keys = {self.get_key(tag): tag for tag in sorted(tags)}
+        versions = self.cache.get_many(list(keys))
+        for key in keys.keys() - versions.keys():
+            # a new version rather than 0, as entries of an evicted version could still be cached
+            self.cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = self.cache.get(key)
+        return {tag: versions[key] for key, tag in keys.items()}
+
+    def invalidate(self, *tags):
+        self.cache.set_many({self.get_key(tag): time.time_ns() for tag in tags}, timeout=None)
+
+
+cache_tags = CacheTags(settings.GRAPHQL_RESPONSE_CACHE_ALIAS)
+
+
+def model_tag(model):
+    return model._meta.label
+
+
+def user_scope(user):
+    """
+    What the result of a query depends on for a user: its rights, language and, with ROW_SECURITY, the health
+    facility and districts its data is restricted to. Users sharing them share the cached results.
+    """
+    if user is None or user.is_anonymous:
+        scope = {"anonymous": True}
+    else:
+        scope = {
+            "superuser": user.is_superuser,
+            "rights": sorted(str(right) for right in getattr(user, "rights", [])),
+        }
+        if settings.ROW_SECURITY:
+            scope["health_facility"] = getattr(getattr(user, "_u", None), "health_facility_id", None)
+            scope["districts"] = _user_districts(user)
+    scope["language"] = translation.get_language()
+    return hashlib.sha256(json.dumps(scope, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _user_districts(user):
+    if not apps.is_installed("location") or not getattr(user, "i_user_id", None):
+        return []
+    user_district = apps.get_model("location", "UserDistrict")
+    return sorted(
+        user_district.objects.filter(user_id=user.i_user_id, validity_to__isnull=True)
+        .values_list("location_id", flat=True)
+    )
+
+
+class ResponseCacheOperationMiddleware:
+    """
+    Caches the data of read-only operations whose root fields are all in GRAPHQL_RESPONSE_CACHE_FIELDS, by query,
+    variables and user scope. Each field lists the model tags its result depends on: saving or deleting one of these
+    models, or the service signals of GRAPHQL_RESPONSE_CACHE_SERVICE_SIGNALS, invalidate the cached results.
+    Results with errors are not cached.
+    """
+
+    def execute(self, next, request, document, operation_name):
+        tags = self.get_tags(document, operation_name) if settings.GRAPHQL_RESPONSE_CACHE_ENABLED else None
+        # streamed operations are executed once per page, with the same query and variables
+        if not tags or getattr(request, "graphql_stream", None) is not None:
+            return next(request, document, operation_name)
+
+        cache = caches[settings.GRAPHQL_RESPONSE_CACHE_ALIAS]
+        key = self.get_key(request, document, operation_name, tags)
+        data = cache.get(key)
+        if data is not None:
+            request.graphql_response_cached = True
+            return ExecutionResult(data=data)
+
+        result = next(request, document, operation_name)
+        if not result.errors and not result.invalid and result.data is not None:
+            cache.set(key, result.data, settings.GRAPHQL_RESPONSE_CACHE_TTL)
+        return result
+
+    def get_tags(self, document, operation_name):
+        """Model tags of the operation, None if it is not cacheable"""
+        operation_type, root_fields = get_root_fields(document, operation_name)
+        if operation_type != "query" or not root_fields:
+            return None
+        tags = set()
+        for selection in root_fields:
+            if not isinstance(selection, ast.Field):
+                return None
+            if selection.name.value == "__typename":
+                continue
+            field_tags = settings.GRAPHQL_RESPONSE_CACHE_FIELDS.get(selection.name.value)
+            if field_tags is None:
+                return None
+            tags.update(field_tags)
+        return tags
+
+    def get_key(self, request, document, operation_name, tags):
+        variables = json.dumps(getattr(request, "graphql_variables", None), sort_keys=True, default=str)
+        versions = json.dumps(cache_tags.versions(tags), sort_keys=True)
+        key = hashlib.sha256("\n".join((
+            query_hash(document.document_string), operation_name or "", variables, user_scope(request.user), versions
+        )).encode("utf-8")).hexdigest()
+        return f"response:{key}"
+
+
+_tagged_models = set(
+    tag for tags in settings.GRAPHQL_RESPONSE_CACHE_FIELDS.values() for tag in tags
+) if settings.GRAPHQL_RESPONSE_CACHE_ENABLED else set()
+
+
+def register_tags(tags):
+    """Models whose save and delete invalidate the cached values, besides those of GRAPHQL_RESPONSE_CACHE_FIELDS"""
+    _tagged_models.update(tags)
+
+
+def invalidate_on_commit(*tags):
+    # invalidated once the change is visible to the other connections, so they do not cache the previous data again
+    transaction.on_commit(lambda: cache_tags.invalidate(*tags))
+
+
+def invalidate_model(sender, **kwargs):
+    tag = model_tag(sender)
+    if tag in _tagged_models:
+        invalidate_on_commit(tag)
+
+
+class ServiceSignalInvalidation:
+    """Receiver of a service signal invalidating the given tags, kept referenced as signals hold weak references"""
+
+    def __init__(self, tags):
+        self.tags = tags
+
+    def __call__(self, *args, **kwargs):
+        invalidate_on_commit(*self.tags)
+
+
+_service_signal_receivers = []
+
+
+def connect_invalidation_signals():
+    if not settings.GRAPHQL_RESPONSE_CACHE_ENABLED and not settings.GRAPHQL_FIELD_CACHE_ENABLED:
+        return
+    post_save.connect(invalidate_model, dispatch_uid="openIMIS.response_cache.post_save")
+    post_delete.connect(invalidate_model, dispatch_uid="openIMIS.response_cache.post_delete")
+    if not settings.GRAPHQL_RESPONSE_CACHE_ENABLED or not settings.GRAPHQL_RESPONSE_CACHE_SERVICE_SIGNALS:
+        return
+    from core.service_signals import ServiceSignalBindType
+    from core.signals import bind_service_signal
+    for signal_name, tags in settings.GRAPHQL_RESPONSE_CACHE_SERVICE_SIGNALS.items():
+        receiver = ServiceSignalInvalidation(tags)
+        _service_signal_receivers.append(receiver)
+        bind_service_signal(signal_name, receiver, bind_type=ServiceSignalBindType.AFTER)
@@ -1,9 +1,13 @@
 import graphene
 
-from core.models import Language
+from core.models import Language, MutationLog
+from core.schema import MutationLogGQLType
+from django.conf import settings
 from django.utils import translation
 
+from .module_registry import module_registry
 from .openimisapps import openimis_apps
+from .subscriptions import MUTATION_LOG_TOPIC, SubscriptionField
 from graphene_django.debug import DjangoDebug
 
 import logging
@@ -13,45 +17,41 @@ logger = logging.getLogger(__name__)
 all_apps = openimis_apps()
 queries = []
 mutations = []
+subscriptions = []
 bind_signals = []
 for app in all_apps:
     try:
-        # If we only __import__ the module, the schema is not loaded and .schema will fail. Adding an import to force
-        # Python to load it would work but not from __init__.py because Django models are not loaded yet at that point.
-        # Importing claim.schema still returns the claim module but it forces the loading of schema.
-        # This code is executed on first access to the Graphene API
-        schema = __import__(f"{app}.schema")
-        if hasattr(schema.schema, "Query"):
-            queries.append(schema.schema.Query)
-            logger.debug(f"{app} queries loaded")
-        if hasattr(schema.schema, "bind_signals"):
-            bind_signals.append(schema.schema.bind_signals)
-            logger.debug(f"{app} signals bound")
+        # Module schemas are imported once, through the module registry, when it is not loaded yet. This code is
+        # executed on first access to the Graphene API
+        schema = module_registry.get_submodule(app, "schema")
     except ModuleNotFoundError as exc:
-        pass
-        # The module doesn't have a schema.py, just skip
-        #logger.debug(f"{app} has no schema module, skipping")
+        # A dependency of the schema is missing, just skip
+        logger.debug(f"{app} schema couldn't be imported: {exc}")
+        schema = None
     except AttributeError as exc:
         logger.debug(f"{app} queries couldn't be loaded")
         raise  # This can be hiding actual compilation errors
-    except Exception as exc:
-        logger.debug(f"{app} exception", exc)
-
-    try:
-        schema_module = __import__(f"{app}.schema")
-        if hasattr(schema_module.schema, "Mutation"):
-            mutation = schema_module.schema.Mutation
-            if mutation:
-                mutations.append(mutation)
+    except Exception:
+        # skipped as before, without hiding the error
+        logger.exception(f"{app} schema failed to load")
+        schema = None
+
+    if schema is not None:
+        if hasattr(schema, "Query"):
+            queries.append(schema.Query)
+            logger.debug(f"{app} queries loaded")
+        if hasattr(schema, "Subscription"):
+            subscriptions.append(schema.Subscription)
+            logger.debug(f"{app} subscriptions loaded")
+        if hasattr(schema, "bind_signals"):
+            bind_signals.append(schema.bind_signals)
+            logger.debug(f"{app} signals bound")
+        if hasattr(schema, "Mutation"):
+            if schema.Mutation:
+                mutations.append(schema.Mutation)
                 logger.debug(f"{app} mutations loaded")
         else:
             logger.debug(f"{app} has a schema module but no Mutation class")
-    except ModuleNotFoundError as exc:
-        # The module doesn't have a schema.py, just skip
-        logger.debug(f"{app} has no schema module (mutation), skipping")
-    except AttributeError as exc:
-        # The module doesn't have a Query or Mutation, just ignore
-        logger.debug(f"{app} has a schema module and Mutation but failed nonetheless")
 
     for binder in bind_signals:
         binder()
@@ -66,18 +66,51 @@ class Mutation(*mutations, graphene.ObjectType):
     pass
 
 
+class Subscription(*subscriptions, graphene.ObjectType):
+    """
+    Subscriptions of the modules (SubscriptionField of their Subscription class), resolved on the events published to
+    their topic (see subscriptions.publish)
+    """
+    mutation_log = SubscriptionField(
+        MutationLogGQLType,
+        topic=MUTATION_LOG_TOPIC,
+        client_mutation_id=graphene.String(),
+        description="Mutation logs of the user, on every change of their status",
+    )
+
+    def resolve_mutation_log(event, info, client_mutation_id=None):
+        queryset = MutationLogGQLType.get_queryset(MutationLog.objects.filter(id=event["id"]), info)
+        if client_mutation_id:
+            queryset = queryset.filter(client_mutation_id=client_mutation_id)
+        return queryset.first()
+
+
+def activate_user_language(user):
+    if user and hasattr(user, "language") and user.language:
+        lang = user.language
+        if isinstance(lang, Language):
+            translation.activate(lang.code)
+        else:
+            translation.activate(lang)
+
+
 class GQLUserLanguageMiddleware:
     def resolve(self, next_middleware, root, info, **kwargs):
-        if info and info.context and info.context.user and hasattr(info.context.user, "language") \
-                and info.context.user.language:
-            lang = info.context.user.language
-            if isinstance(lang, Language):
-                translation.activate(lang.code)
-            else:
-                translation.activate(lang)
+        if info and info.context:
+            activate_user_language(info.context.user)
         return next_middleware(root, info, **kwargs)
 
 
+class GQLUserLanguageOperationMiddleware:
+    """Same as GQLUserLanguageMiddleware but activates the language once per operation instead of once per field"""
+    def execute(self, next_operation, request, document, operation_name):
+        activate_user_language(getattr(request, "user", None))
+        return next_operation(request, document, operation_name)
+
+
 # noinspection PyTypeChecker
-schema = graphene.Schema(query=Query, mutation=Mutation if len(mutations) > 0 else None)
+schema = graphene.Schema(
+    query=Query, mutation=Mutation if len(mutations) > 0 else None,
+    subscription=Subscription if settings.GRAPHQL_SUBSCRIPTIONS_ENABLED else None,
+)
 
@@ -26,7 +26,9 @@ base_settings = [
     'sentry.py',
     'scheduler.py',
     'queue_cache.py',
+    'metrics.py',
     'opensearch.py',
+    'graphql.py',
     'trad.py',
     f'{MODE}.py'
     # Optional local settings
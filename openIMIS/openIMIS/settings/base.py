@@ -83,7 +83,14 @@ AUTHENTICATION_BACKENDS += [
 
 ANONYMOUS_USER_NAME = None
 
+# Encode the GraphQL and REST responses with orjson, the standard library encoder is used when it is not installed
+FAST_JSON_ENCODER = os.environ.get("FAST_JSON_ENCODER", "true").lower() == "true"
+
 REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "openIMIS.json_encoding.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "core.jwt_authentication.JWTAuthentication",
         "rest_framework.authentication.BasicAuthentication",
@@ -162,13 +169,26 @@ GRAPHENE = {
     "SCHEMA": "openIMIS.schema.schema",
     "RELAY_CONNECTION_MAX_LIMIT": 100,
     "GRAPHIQL_HEADER_EDITOR_ENABLED": True,
+    # Executed on every field resolution, operation wide concerns belong to GRAPHQL_OPERATION_MIDDLEWARE.
+    # OperationFallbackMiddleware authenticates the executions outside of OpenIMISGraphQLView, which skips it
     "MIDDLEWARE": [
         "openIMIS.tracer.TracerMiddleware",
-        "openIMIS.schema.GQLUserLanguageMiddleware",
-        "graphql_jwt.middleware.JSONWebTokenMiddleware"
+        "openIMIS.operation_middleware.OperationFallbackMiddleware",
     ],
 }
 
+# Executed once per GraphQL operation by OpenIMISGraphQLView, in this order
+GRAPHQL_OPERATION_MIDDLEWARE = [
+    "openIMIS.tracer.TracerOperationMiddleware",
+    "openIMIS.metrics.MetricsOperationMiddleware",
+    "openIMIS.operation_middleware.JSONWebTokenOperationMiddleware",
+    "openIMIS.operation_budget.OperationBudgetOperationMiddleware",
+    "openIMIS.sql_diagnostics.SQLDiagnosticsOperationMiddleware",
+    "openIMIS.schema.GQLUserLanguageOperationMiddleware",
+    "openIMIS.response_cache.ResponseCacheOperationMiddleware",
+    "openIMIS.coalescing.CoalescingOperationMiddleware",
+]
+
 if DEBUG:
     GRAPHENE['MIDDLEWARE'] += [
         "graphene_django.debug.DjangoDebugMiddleware"  # adds a _debug query to graphQL with sql debug info
@@ -0,0 +1,136 @@
+import json
+import os
+from .common import BASE_DIR
+
+# Parsed and validated GraphQL documents are kept in a per-process LRU cache, keyed by a hash of the query text and
+# of the schema. The least recently used documents are evicted once GRAPHQL_DOCUMENT_CACHE_SIZE is reached,
+# 0 disables the cache. Queries longer than GRAPHQL_DOCUMENT_CACHE_MAX_QUERY_LENGTH and invalid ones are never cached.
+GRAPHQL_DOCUMENT_CACHE_SIZE = int(os.environ.get("GRAPHQL_DOCUMENT_CACHE_SIZE", 1000))
+GRAPHQL_DOCUMENT_CACHE_MAX_QUERY_LENGTH = int(os.environ.get("GRAPHQL_DOCUMENT_CACHE_MAX_QUERY_LENGTH", 100000))
+
+# Automatic persisted queries: clients may send the sha256 hash of a query instead of its text. The hash to query
+# mapping is kept in the GRAPHQL_APQ_CACHE cache alias for GRAPHQL_APQ_TTL seconds.
+GRAPHQL_APQ_ENABLED = os.environ.get("GRAPHQL_APQ_ENABLED", "true").lower() == "true"
+GRAPHQL_APQ_CACHE = os.environ.get("GRAPHQL_APQ_CACHE", "default")
+GRAPHQL_APQ_TTL = int(os.environ.get("GRAPHQL_APQ_TTL", 24 * 3600))
+
+# Persisted queries only mode: reject every operation that is not registered in GRAPHQL_PERSISTED_QUERIES_FILE
+# (see the register_persisted_queries management command). The registered documents are parsed and validated once,
+# when the process starts: the system check openIMIS.W001 reports a missing file and the invalid ones.
+GRAPHQL_PERSISTED_QUERIES_ONLY = os.environ.get("GRAPHQL_PERSISTED_QUERIES_ONLY", "false").lower() == "true"
+GRAPHQL_PERSISTED_QUERIES_FILE = os.environ.get(
+    "GRAPHQL_PERSISTED_QUERIES_FILE", os.path.join(BASE_DIR, "persisted_queries.json")
+)
+
+# Static cost analysis done before executing an operation: the depth is the field nesting level and the cost the
+# estimated number of resolved fields, connections multiplying their selection by `first` (or
+# RELAY_CONNECTION_MAX_LIMIT) and plain lists by GRAPHQL_QUERY_COST_LIST_SIZE. Operations above
+# GRAPHQL_MAX_QUERY_DEPTH or GRAPHQL_MAX_QUERY_COST are rejected, 0 disables the check. Operations above
+# GRAPHQL_HEAVY_QUERY_COST wait up to GRAPHQL_HEAVY_QUERY_QUEUE_TIMEOUT seconds for one of the
+# GRAPHQL_HEAVY_QUERY_CONCURRENCY slots of the worker.
+GRAPHQL_MAX_QUERY_DEPTH = int(os.environ.get("GRAPHQL_MAX_QUERY_DEPTH", 20))
+GRAPHQL_MAX_QUERY_COST = int(os.environ.get("GRAPHQL_MAX_QUERY_COST", 1000000))
+GRAPHQL_QUERY_COST_LIST_SIZE = int(os.environ.get("GRAPHQL_QUERY_COST_LIST_SIZE", 10))
+GRAPHQL_HEAVY_QUERY_COST = int(os.environ.get("GRAPHQL_HEAVY_QUERY_COST", 0))
+GRAPHQL_HEAVY_QUERY_CONCURRENCY = int(os.environ.get("GRAPHQL_HEAVY_QUERY_CONCURRENCY", 2))
+GRAPHQL_HEAVY_QUERY_QUEUE_TIMEOUT = float(os.environ.get("GRAPHQL_HEAVY_QUERY_QUEUE_TIMEOUT", 30))
+
+# SQL diagnostics: the statements of an operation are recorded with the path of the resolver issuing them and the
+# shapes repeated at least GRAPHQL_SQL_DIAGNOSTICS_REPEAT_THRESHOLD times are logged (N+1 queries). Enabled for a share
+# of the operations with GRAPHQL_SQL_DIAGNOSTICS_SAMPLE_RATE, or by superusers with the `X-SQL-Diagnostics: true`
+# header.
+GRAPHQL_SQL_DIAGNOSTICS_SAMPLE_RATE = float(os.environ.get("GRAPHQL_SQL_DIAGNOSTICS_SAMPLE_RATE", 0))
+GRAPHQL_SQL_DIAGNOSTICS_REPEAT_THRESHOLD = int(os.environ.get("GRAPHQL_SQL_DIAGNOSTICS_REPEAT_THRESHOLD", 5))
+
+# Budgets of a single operation: SQL statements, cumulated SQL time and wall time. Operations over one of them are
+# logged with their variables shape and hot spots, 0 disables a budget. With GRAPHQL_OPERATION_BUDGET_ENFORCE the SQL
+# statements beyond the budgets fail instead of only being logged.
+GRAPHQL_OPERATION_MAX_QUERIES = int(os.environ.get("GRAPHQL_OPERATION_MAX_QUERIES", 500))
+GRAPHQL_OPERATION_MAX_SQL_TIME_MS = int(os.environ.get("GRAPHQL_OPERATION_MAX_SQL_TIME_MS", 5000))
+GRAPHQL_OPERATION_MAX_TIME_MS = int(os.environ.get("GRAPHQL_OPERATION_MAX_TIME_MS", 10000))
+GRAPHQL_OPERATION_BUDGET_ENFORCE = os.environ.get("GRAPHQL_OPERATION_BUDGET_ENFORCE", "false").lower() == "true"
+
+# Cache of the data of read-only operations whose root fields are all listed in GRAPHQL_RESPONSE_CACHE_FIELDS, kept
+# GRAPHQL_RESPONSE_CACHE_TTL seconds in the GRAPHQL_RESPONSE_CACHE_ALIAS cache alias. Each field maps to the models
+# ("app_label.Model") its result depends on, whose changes invalidate it. Changes not going through the model save or
+# delete (bulk updates, raw SQL) can be declared with GRAPHQL_RESPONSE_CACHE_SERVICE_SIGNALS, service signal name to
+# models. With several processes, the alias must be a shared cache (CACHE_BACKEND).
+GRAPHQL_RESPONSE_CACHE_ENABLED = os.environ.get("GRAPHQL_RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+GRAPHQL_RESPONSE_CACHE_ALIAS = os.environ.get("GRAPHQL_RESPONSE_CACHE_ALIAS", "graphql")
+GRAPHQL_RESPONSE_CACHE_TTL = int(os.environ.get("GRAPHQL_RESPONSE_CACHE_TTL", 3600))
+GRAPHQL_RESPONSE_CACHE_FIELDS = json.loads(os.environ.get("GRAPHQL_RESPONSE_CACHE_FIELDS", "null")) or {
+    "locations": ["location.Location"],
+    "healthFacilities": ["location.HealthFacility", "location.Location"],
+    "medicalItems": ["medical.Item"],
+    "medicalServices": ["medical.Service"],
+    "products": ["product.Product"],
+    "itemsPricelists": ["medical_pricelist.ItemsPricelist", "medical_pricelist.ItemsPricelistDetail"],
+    "servicesPricelists": ["medical_pricelist.ServicesPricelist", "medical_pricelist.ServicesPricelistDetail"],
+}
+GRAPHQL_RESPONSE_CACHE_SERVICE_SIGNALS = json.loads(os.environ.get("GRAPHQL_RESPONSE_CACHE_SERVICE_SIGNALS", "{}"))
+
+# Field resolvers decorated with openIMIS.field_cache.cached keep their values in GRAPHQL_RESPONSE_CACHE_ALIAS, for
+# GRAPHQL_FIELD_CACHE_TTL seconds unless the decorator sets its own ttl. The cache has to be shared by the workers
+# (system check openIMIS.E002), which would otherwise not see the invalidations of the others.
+GRAPHQL_FIELD_CACHE_ENABLED = os.environ.get("GRAPHQL_FIELD_CACHE_ENABLED", "false").lower() == "true"
+GRAPHQL_FIELD_CACHE_TTL = int(os.environ.get("GRAPHQL_FIELD_CACHE_TTL", 600))
+
+# Identical read-only operations running concurrently in a worker share one execution, within a scope: "user", "role"
+# (same rights, row security scope and language) or "global". Only the "user" scope suits operations depending on the
+# user itself (e.g. mutationLogs). With GRAPHQL_COALESCING_SHARED, the workers wait up to
+# GRAPHQL_COALESCING_TIMEOUT seconds for each other through a lock in GRAPHQL_RESPONSE_CACHE_ALIAS, where the results
+# are kept at most GRAPHQL_COALESCING_RESULT_TTL seconds for the workers waiting while they were computed.
+GRAPHQL_COALESCING_ENABLED = os.environ.get("GRAPHQL_COALESCING_ENABLED", "false").lower() == "true"
+GRAPHQL_COALESCING_SCOPE = os.environ.get("GRAPHQL_COALESCING_SCOPE", "user")
+GRAPHQL_COALESCING_SHARED = os.environ.get("GRAPHQL_COALESCING_SHARED", "false").lower() == "true"
+GRAPHQL_COALESCING_TIMEOUT = float(os.environ.get("GRAPHQL_COALESCING_TIMEOUT", 30))
+GRAPHQL_COALESCING_RESULT_TTL = int(os.environ.get("GRAPHQL_COALESCING_RESULT_TTL", 5))
+
+# Batched GraphQL requests (a list of operations posted to graphql/batch): the consecutive queries of a batch are
+# executed concurrently by a pool of GRAPHQL_BATCH_CONCURRENCY threads per process, each using its own database
+# connection. Mutations keep their order. 1 executes the operations one after another.
+GRAPHQL_BATCH_ENABLED = os.environ.get("GRAPHQL_BATCH_ENABLED", "false").lower() == "true"
+GRAPHQL_BATCH_CONCURRENCY = int(os.environ.get("GRAPHQL_BATCH_CONCURRENCY", 4))
+
+# Queries on a single connection posted with the `stream=true` parameter get their edges streamed, resolving
+# GRAPHQL_STREAMING_PAGE_SIZE objects at a time (below 2000 with SQL Server, which limits the query parameters). The
+# whole connection is streamed, only bounded by GRAPHQL_MAX_QUERY_COST. WSGI only: under ASGI, the queries are
+# answered as usual.
+GRAPHQL_STREAMING_ENABLED = os.environ.get("GRAPHQL_STREAMING_ENABLED", "false").lower() == "true"
+GRAPHQL_STREAMING_PAGE_SIZE = int(os.environ.get("GRAPHQL_STREAMING_PAGE_SIZE", 1000))
+
+# Exports of the nodes of a connection posted to graphql/export, written as NDJSON or CSV by a Celery worker to the
+# GRAPHQL_EXPORT_DIRECTORY of MEDIA_ROOT, GRAPHQL_EXPORT_PAGE_SIZE objects at a time. Export files are deleted
+# GRAPHQL_EXPORT_RETENTION seconds after they are written.
+GRAPHQL_EXPORT_ENABLED = os.environ.get("GRAPHQL_EXPORT_ENABLED", "false").lower() == "true"
+GRAPHQL_EXPORT_DIRECTORY = os.environ.get("GRAPHQL_EXPORT_DIRECTORY", "exports")
+GRAPHQL_EXPORT_PAGE_SIZE = int(os.environ.get("GRAPHQL_EXPORT_PAGE_SIZE", 1000))
+GRAPHQL_EXPORT_RETENTION = int(os.environ.get("GRAPHQL_EXPORT_RETENTION", 86400))
+
+# Connection fields using openIMIS.keyset_pagination encode the sort keys of the nodes in their cursors and seek the
+# next pages with WHERE (keys) > (cursor) instead of OFFSET. Disabled, they are paginated by offset again.
+GRAPHQL_KEYSET_PAGINATION_ENABLED = os.environ.get("GRAPHQL_KEYSET_PAGINATION_ENABLED", "true").lower() == "true"
+
+# Connection fields using openIMIS.estimated_count accept an `estimatedCount` argument: above
+# GRAPHQL_ESTIMATED_COUNT_THRESHOLD objects estimated by the database planner (PostgreSQL and SQL Server), their
+# totalCount is that estimate until a Celery worker has counted them exactly, the exact count being cached
+# GRAPHQL_ESTIMATED_COUNT_TTL seconds in GRAPHQL_RESPONSE_CACHE_ALIAS.
+GRAPHQL_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get("GRAPHQL_ESTIMATED_COUNT_THRESHOLD", 10000))
+GRAPHQL_ESTIMATED_COUNT_TTL = int(os.environ.get("GRAPHQL_ESTIMATED_COUNT_TTL", 300))
+
+# Mutations posted to graphql?async=true are executed by a Celery worker when all their root fields are in
+# GRAPHQL_ASYNC_MUTATIONS (JSON list of field names, none if empty). Their jobs, with their progress and result, are
+# kept GRAPHQL_ASYNC_MUTATION_TTL seconds in GRAPHQL_RESPONSE_CACHE_ALIAS, which must be shared with the Celery workers
+# (CACHE_BACKEND): local memory caches are refused by the system checks.
+GRAPHQL_ASYNC_MUTATIONS_ENABLED = os.environ.get("GRAPHQL_ASYNC_MUTATIONS_ENABLED", "false").lower() == "true"
+GRAPHQL_ASYNC_MUTATIONS = json.loads(os.environ.get("GRAPHQL_ASYNC_MUTATIONS", "[]"))
+GRAPHQL_ASYNC_MUTATION_TTL = int(os.environ.get("GRAPHQL_ASYNC_MUTATION_TTL", 86400))
+
+# GraphQL subscriptions on the ws/graphql websocket (graphql-ws protocol). Modules publish events to the topics of their
+# SubscriptionField with openIMIS.subscriptions.publish, through the channel layer (CHANNEL_LAYERS).
+GRAPHQL_SUBSCRIPTIONS_ENABLED = os.environ.get("GRAPHQL_SUBSCRIPTIONS_ENABLED", "false").lower() == "true"
+
+# Under ASGI (start_asgi), graphql and graphql/batch are served by an async view: each request is executed by one of
+# GRAPHQL_ASGI_THREADS threads per process, and async resolvers run on the event loop, overlapping each other.
+GRAPHQL_ASGI_ENABLED = os.environ.get("GRAPHQL_ASGI_ENABLED", "false").lower() == "true"
+GRAPHQL_ASGI_THREADS = int(os.environ.get("GRAPHQL_ASGI_THREADS", 8))
@@ -0,0 +1,31 @@
+import os
+import logging
+
+# Prometheus metrics exposed on the metrics/ endpoint, requires metrics-requirements.txt.
+# With several worker processes (gunicorn, celery), PROMETHEUS_MULTIPROC_DIR must point to a directory shared by all
+# of them and emptied before they start.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "false").lower() == "true"
+# Count the hits and misses of the CACHES aliases, by wrapping their backend
+METRICS_INSTRUMENT_CACHES = os.environ.get("METRICS_INSTRUMENT_CACHES", "true").lower() == "true"
+# The metrics endpoint only answers the requests of METRICS_ALLOWED_IPS (comma separated addresses or networks) or
+# bearing METRICS_TOKEN in their `Authorization: Bearer` header
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_ALLOWED_IPS = [
+    network.strip() for network in os.environ.get("METRICS_ALLOWED_IPS", "127.0.0.1,::1").split(",") if network.strip()
+]
+IS_METRICS_ENABLED = False
+
+if METRICS_ENABLED:
+    try:
+        import prometheus_client
+        IS_METRICS_ENABLED = True
+    except ModuleNotFoundError:
+        logging.error(
+            "prometheus_client has to be installed to expose metrics. Run `pip install -r metrics-requirements.txt`."
+        )
+
+if IS_METRICS_ENABLED and METRICS_INSTRUMENT_CACHES:
+    for alias, cache_settings in CACHES.items():
+        cache_settings["INSTRUMENTED_BACKEND"] = cache_settings["BACKEND"]
+        cache_settings["INSTRUMENTED_ALIAS"] = alias
+        cache_settings["BACKEND"] = "openIMIS.metrics.InstrumentedCache"
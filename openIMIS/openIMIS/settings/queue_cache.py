@@ -7,6 +7,8 @@ CACHE_OBJECT_TTL =  int(os.environ.get("CACHE_OBJECT_TTL", 3600))
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "amqp://rabitmq")
 if 'CELERY_RESULT_BACKEND' in os.environ:
     CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND")
+# Tasks of the openIMIS package itself, not found by the autodiscovery of the modules tasks
+CELERY_IMPORTS = ("openIMIS.export", "openIMIS.estimated_count", "openIMIS.async_mutations")
 
 if 'CACHE_BACKEND' in os.environ and 'CACHE_URL' in os.environ:
     CACHE_BACKEND = os.environ.get('CACHE_BACKEND')
@@ -40,6 +42,10 @@ CACHES = {
         **CACHE_PARAM,
         'KEY_PREFIX': "cov"
 
+    },
+    'graphql': {
+        **CACHE_PARAM,
+        'KEY_PREFIX': "gql"
     }
 }
 
@@ -3,6 +3,10 @@ import os
 SENTRY_DSN = os.environ.get("SENTRY_DSN", None)
 SENTRY_SAMPLE_RATE = os.environ.get("SENTRY_SAMPLE_RATE", "0.2")
 IS_SENTRY_ENABLED = False
+# Share of the GraphQL operations whose resolvers are traced, the others only get an operation span
+SENTRY_RESOLVER_SAMPLE_RATE = float(os.environ.get("SENTRY_RESOLVER_SAMPLE_RATE", "0.1"))
+# In sampled operations, nested resolvers are only reported when slower than this
+SENTRY_SLOW_RESOLVER_THRESHOLD_MS = float(os.environ.get("SENTRY_SLOW_RESOLVER_THRESHOLD_MS", "100"))
 
 if SENTRY_DSN is not None:
     try:
@@ -0,0 +1,123 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.db import connection
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.utils import get_http_authorization
+
+logger = logging.getLogger(__name__)
+
+DIAGNOSTICS_HEADER = "HTTP_X_SQL_DIAGNOSTICS"
+
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Shape of a statement: literals and IN lists collapsed so that statements differing only by values match"""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def normalize_path(path):
+    if not path:
+        return "<operation>"
+    return ".".join("*" if isinstance(part, int) else str(part) for part in path)
+
+
+class SQLRecorder:
+    """
+    Records the SQL statements of an operation along with the path of the resolver running them, which
+    TracerMiddleware keeps in current_path. Statements issued by dataloader batches are attributed to the resolver
+    that triggered the batch, if any.
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.current_path = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.statements.append((self.current_path, sql, time.perf_counter() - start))
+
+    def report(self, repeat_threshold):
+        groups = defaultdict(lambda: {"count": 0, "duration_ms": 0.0})
+        for path, sql, duration in self.statements:
+            group = groups[(normalize_path(path), normalize_sql(sql))]
+            group["count"] += 1
+            group["duration_ms"] += duration * 1000
+        repeated = [
+            {"path": path, "sql": sql, "count": group["count"], "duration_ms": round(group["duration_ms"], 2)}
+            for (path, sql), group in groups.items()
+            if group["count"] >= repeat_threshold
+        ]
+        return sorted(repeated, key=lambda statement: statement["count"], reverse=True)
+
+
+def is_diagnostics_user(request):
+    """
+    Whether the user of the request is an authenticated superuser, allowed to ask for diagnostics. Its JWT is
+    authenticated here if need be, the header being read before JSONWebTokenOperationMiddleware.
+    """
+    user = getattr(request, "user", None)
+    if (user is None or not user.is_authenticated) and get_http_authorization(request) is not None:
+        try:
+            user = authenticate(request=request)
+        except JSONWebTokenError:
+            return False
+        if user is not None:
+            request.user = user
+    return user is not None and user.is_authenticated and user.is_superuser
+
+
+def request_sql_diagnostics(request):
+    """
+    Decides whether the SQL statements of the operation are recorded, either because the X-SQL-Diagnostics header of
+    a superuser asks for it or by sampling (GRAPHQL_SQL_DIAGNOSTICS_SAMPLE_RATE). It is decided before the field
+    middleware are built, as TracerMiddleware has to be part of them to know the resolver paths.
+    """
+    requested = request.META.get(DIAGNOSTICS_HEADER, "").lower() == "true" and is_diagnostics_user(request)
+    sampled = random.random() < settings.GRAPHQL_SQL_DIAGNOSTICS_SAMPLE_RATE
+    request.sql_diagnostics_requested = requested
+    request.sql_diagnostics = SQLRecorder() if requested or sampled else None
+    return request.sql_diagnostics is not None
+
+
+class SQLDiagnosticsOperationMiddleware:
+    """
+    Logs the statement shapes repeated at least GRAPHQL_SQL_DIAGNOSTICS_REPEAT_THRESHOLD times in an operation,
+    grouped by resolver path: the usual sign of N+1 queries. Diagnostics asked with the header are only honoured
+    for authenticated superusers.
+    """
+
+    def execute(self, next, request, document, operation_name):
+        recorder = getattr(request, "sql_diagnostics", None)
+        if recorder is not None and getattr(request, "sql_diagnostics_requested", False) \
+                and not (request.user.is_authenticated and request.user.is_superuser):
+            recorder = request.sql_diagnostics = None
+        if recorder is None:
+            return next(request, document, operation_name)
+
+        with connection.execute_wrapper(recorder):
+            result = next(request, document, operation_name)
+        repeated = recorder.report(settings.GRAPHQL_SQL_DIAGNOSTICS_REPEAT_THRESHOLD)
+        request.sql_diagnostics_report = repeated
+        if repeated:
+            logger.warning(
+                "Repeated SQL statements in GraphQL operation %s (%s statements in total): %s",
+                operation_name, len(recorder.statements), json.dumps(repeated),
+            )
+        return result
@@ -0,0 +1,167 @@
+import logging
+
+from django.db.models.query import QuerySet
+from graphene.relay import Connection, PageInfo
+from graphql.language import ast
+from graphql.type import GraphQLNonNull
+from graphql_relay.connection.arrayconnection import cursor_to_offset, offset_to_cursor
+from promise import Promise
+
+from .json_encoding import encode_json
+from .query_cost import analyze_query_cost, check_query_cost
+
+logger = logging.getLogger(__name__)
+
+PAGINATION_ARGUMENTS = ("first", "last", "after", "before", "offset")
+
+
+class ConnectionStream:
+    """
+    Streams the edges of the only root connection of a query, page by page. The operation is executed once per page:
+    on the first one, this field middleware lets the connection resolve its queryset (filters, rights, row security
+    as usual) with a single edge, then keeps the primary keys of all the objects it returns. On every page, the
+    connection is replaced by the next page_size objects, fetched by primary key, whose nested fields are resolved as
+    usual. The `first` and `after` arguments still limit the objects streamed, without RELAY_CONNECTION_MAX_LIMIT,
+    but the operation cost is checked again for all of them (GRAPHQL_MAX_QUERY_COST).
+    Connections not resolving a queryset (other than graphene-django ones), paginated backwards or after a keyset
+    cursor are not streamed.
+    """
+
+    def __init__(self, page_size):
+        self.page_size = page_size
+        self.started = False
+        self.field_key = None
+        self.edges_key = None
+        self.connection_type = None
+        self.queryset = None
+        self.keys = None
+        self.offset = 0
+        self.total = 0
+        self.position = 0
+
+    @property
+    def has_more(self):
+        return self.started and self.position < len(self.keys)
+
+    def resolve(self, next, root, info, **args):
+        if len(info.path) != 1:
+            return next(root, info, **args)
+        if self.started:
+            return self.next_page()
+        if not self.is_streamable(info, args):
+            return next(root, info, **args)
+        query_args = {name: value for name, value in args.items() if name not in PAGINATION_ARGUMENTS}
+        return Promise.resolve(next(root, info, first=1, **query_args)).then(
+            lambda connection: self.start(connection, next, root, info, args)
+        )
+
+    def is_streamable(self, info, args):
+        if info.operation.operation != "query" or "last" in args or "before" in args:
+            return False
+        if args.get("after") and cursor_to_offset(args["after"]) is None:
+            # keyset cursors (see keyset_pagination) are not streamed
+            return False
+        selections = info.operation.selection_set.selections
+        if len(selections) != 1 or not isinstance(selections[0], ast.Field):
+            return False
+        return_type = info.return_type.of_type if isinstance(info.return_type, GraphQLNonNull) else info.return_type
+        graphene_type = getattr(return_type, "graphene_type", None)
+        if graphene_type is None or not issubclass(graphene_type, Connection):
+            return False
+        field = info.field_asts[0]
+        for selection in field.selection_set.selections if field.selection_set else []:
+            if isinstance(selection, ast.Field) and selection.name.value == "edges":
+                self.edges_key = selection.alias.value if selection.alias else "edges"
+                self.field_key = field.alias.value if field.alias else field.name.value
+                return True
+        return False
+
+    def start(self, connection, next, root, info, args):
+        iterable = getattr(connection, "iterable", None)
+        if iterable is None:
+            # not a graphene-django connection, resolved again with the requested pagination
+            return next(root, info, **args)
+        self.offset = cursor_to_offset(args["after"]) + 1 if args.get("after") else 0
+        self.offset += args.get("offset") or 0
+        end = self.offset + args["first"] if args.get("first") else None
+        if isinstance(iterable, QuerySet):
+            self.queryset = iterable
+            # distinct orderings on related fields may repeat the keys. Read in chunks, through a server side cursor
+            # where the database supports it.
+            self.keys = list(dict.fromkeys(
+                iterable.values_list("pk", flat=True)[self.offset:end].iterator(chunk_size=self.page_size)
+            ))
+        else:
+            self.keys = list(iterable)[self.offset:end]
+        self.check_cost(info)
+        self.connection_type = type(connection)
+        self.total = int(connection.length)
+        self.started = True
+        return self.next_page()
+
+    def check_cost(self, info):
+        """
+        The cost of the operation was checked for a page of the connection (RELAY_CONNECTION_MAX_LIMIT at most), it is
+        checked again for all the streamed objects
+        """
+        query_cost = analyze_query_cost(
+            info.schema,
+            ast.Document(definitions=[info.operation, *info.fragments.values()]),
+            info.operation.name.value if info.operation.name else None,
+            info.variable_values,
+            root_page_size=max(len(self.keys), 1),
+        )
+        info.context.graphql_query_cost = query_cost
+        check_query_cost(query_cost)
+
+    def next_page(self):
+        keys = self.keys[self.position:self.position + self.page_size]
+        if self.queryset is not None:
+            objects = {obj.pk: obj for obj in self.queryset.filter(pk__in=keys)}
+            nodes = [objects[key] for key in keys if key in objects]
+        else:
+            nodes = keys
+        start = self.offset + self.position
+        edges = [
+            self.connection_type.Edge(node=node, cursor=offset_to_cursor(start + index))
+            for index, node in enumerate(nodes)
+        ]
+        self.position += len(keys)
+        # the page info and total count are those of all the streamed objects
+        connection = self.connection_type(edges=edges, page_info=PageInfo(
+            start_cursor=offset_to_cursor(self.offset) if self.keys else None,
+            end_cursor=offset_to_cursor(self.offset + len(self.keys) - 1) if self.keys else None,
+            has_previous_page=self.offset > 0,
+            has_next_page=self.offset + len(self.keys) < self.total,
+        ))
+        connection.iterable = self.queryset
+        connection.length = self.total
+        return connection
+
+    def iter_json(self, first_result, execute_page, format_error):
+        """
+        JSON response of the stream, from the result of the first page and executing the next ones with execute_page.
+        Errors of later pages end the stream, with the edges streamed so far.
+        """
+        connection = first_result.data[self.field_key]
+        yield b'{"data":{' + encode_json(self.field_key) + b':{' + encode_json(self.edges_key) + b':['
+        yield encode_json(connection[self.edges_key])[1:-1]
+        streamed = bool(connection[self.edges_key])
+        errors = None
+        while self.has_more:
+            result = execute_page()
+            if result.errors or result.invalid or not result.data or not result.data.get(self.field_key):
+                errors = result.errors or []
+                break
+            edges = encode_json(result.data[self.field_key][self.edges_key])[1:-1]
+            if edges:
+                yield (b"," if streamed else b"") + edges
+                streamed = True
+        yield b"]" + b"".join(
+            b"," + encode_json(key) + b":" + encode_json(value)
+            for key, value in connection.items() if key != self.edges_key
+        ) + b"}}"
+        if errors is not None:
+            logger.warning("GraphQL stream of %s interrupted after %s objects", self.field_key, self.position)
+            yield b',"errors":' + encode_json([format_error(error) for error in errors])
+        yield b"}"
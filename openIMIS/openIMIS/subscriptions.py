@@ -0,0 +1,260 @@
+import asyncio
+import logging
+
+import graphene
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.urls import path
+from graphene.utils.str_converters import to_camel_case
+from graphene_django.settings import graphene_settings
+from graphene_django.views import instantiate_middleware
+from graphql import GraphQLSchema
+from graphql.error import GraphQLError
+from graphql.execution import execute
+from graphql.language.base import parse
+from graphql.validation import validate
+from graphql_jwt.settings import jwt_settings
+
+from .dataloaders import get_dataloaders
+from .operation_middleware import get_root_fields
+from .views import OpenIMISGraphQLView, create_worker_request
+from .websocket_auth import get_scope_token, get_token_user
+
+logger = logging.getLogger(__name__)
+
+# websocket subprotocol of subscriptions-transport-ws (Apollo):
+# https://github.com/apollographql/subscriptions-transport-ws
+SUBSCRIPTION_PROTOCOL = "graphql-ws"
+KEEP_ALIVE_INTERVAL = 30
+MUTATION_LOG_TOPIC = "mutation_log"
+
+
+class SubscriptionField(graphene.Field):
+    """
+    Field of the Subscription type of a module, resolved for each subscriber on every event published to its topic
+    (see publish), with the event as root. Its resolver returning None skips the event for the subscriber.
+    """
+
+    def __init__(self, type, topic, *args, **kwargs):
+        super().__init__(type, *args, **kwargs)
+        self.topic = topic
+
+
+def get_topic_group(topic):
+    return f"graphql_subscription_{topic}"
+
+
+def publish(topic, event=None):
+    """
+    Publishes an event (a dict of JSON values) to the subscribers of the topic through the channel layer, once the
+    current transaction is committed
+    """
+    if not settings.GRAPHQL_SUBSCRIPTIONS_ENABLED:
+        return
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    def send():
+        try:
+            async_to_sync(channel_layer.group_send)(
+                get_topic_group(topic), {"type": "graphql.event", "topic": topic, "event": event or {}}
+            )
+        except Exception:
+            logger.warning("Failed to publish the GraphQL subscription event of %s", topic, exc_info=True)
+
+    transaction.on_commit(send)
+
+
+def publish_mutation_log(sender, instance, **kwargs):
+    publish(MUTATION_LOG_TOPIC, {"id": str(instance.id)})
+
+
+def connect_subscription_signals():
+    if not settings.GRAPHQL_SUBSCRIPTIONS_ENABLED:
+        return
+    from core.models import MutationLog
+    post_save.connect(publish_mutation_log, sender=MutationLog, dispatch_uid="openIMIS.subscriptions.mutation_log")
+
+
+_event_schemas = {}
+
+
+def get_event_schema(schema):
+    """Schema whose query type is the subscription type of the schema, executing the subscriptions on each event"""
+    event_schema = _event_schemas.get(id(schema))
+    if event_schema is None:
+        event_schema = _event_schemas[id(schema)] = GraphQLSchema(query=schema.get_subscription_type())
+    return event_schema
+
+
+def get_websocket_user(scope, payload):
+    """
+    User of the JWT of the connection_init payload, else of the websocket (scope["user"] authenticated by
+    JSONWebTokenAuthMiddleware from its authorization header or JWT cookie), None if invalid
+    """
+    token = payload.get("Authorization") or payload.get("authorization") or payload.get("authToken")
+    prefix = f"{jwt_settings.JWT_AUTH_HEADER_PREFIX} "
+    if token and token.startswith(prefix):
+        token = token[len(prefix):]
+    if token:
+        return get_token_user(token)
+    if "user" in scope:
+        user = scope["user"]
+        return user if user.is_authenticated else None
+    token = get_scope_token(scope)
+    return get_token_user(token) if token else None
+
+
+class GraphQLSubscription:
+    """Subscription operation started by a client, validated against the schema once"""
+
+    def __init__(self, schema, query, variables=None, operation_name=None):
+        self.schema = schema
+        self.variables = variables
+        self.operation_name = operation_name
+        self.document_ast = parse(query)
+        errors = validate(schema, self.document_ast)
+        if errors:
+            raise errors[0]
+        operation_type, root_fields = get_root_fields(self, operation_name)
+        if operation_type != "subscription":
+            raise GraphQLError("Only subscriptions can be started")
+        self.topics = self.get_topics(root_fields)
+        # executed as a query of the event schema
+        for definition in self.document_ast.definitions:
+            if getattr(definition, "operation", None) == "subscription":
+                definition.operation = "query"
+
+    def get_topics(self, root_fields):
+        graphene_type = self.schema.get_subscription_type().graphene_type
+        fields = {
+            field.name or (to_camel_case(name) if self.schema.auto_camelcase else name): field
+            for name, field in graphene_type._meta.fields.items()
+        }
+        return {
+            getattr(fields.get(field.name.value), "topic", field.name.value)
+            for field in root_fields if hasattr(field, "name")
+        }
+
+    def execute(self, user, event):
+        """Response of the subscription to the event, None if it is skipped"""
+        from .schema import activate_user_language
+
+        request = create_worker_request(user)
+        request.dataloaders = get_dataloaders()
+        activate_user_language(user)
+        result = execute(
+            get_event_schema(self.schema),
+            self.document_ast,
+            root_value=event,
+            context_value=request,
+            variable_values=self.variables,
+            operation_name=self.operation_name,
+            middleware=list(instantiate_middleware(graphene_settings.MIDDLEWARE)),
+        )
+        if not result.errors and not any((result.data or {}).values()):
+            return None
+        response = {"data": result.data}
+        if result.errors:
+            response["errors"] = [OpenIMISGraphQLView.format_error(error) for error in result.errors]
+        return response
+
+
+class GraphQLSubscriptionConsumer(AsyncJsonWebsocketConsumer):
+    """
+    GraphQL subscriptions over the graphql-ws protocol: the client authenticates with the JWT of its connection_init
+    payload (or its JWT cookie), then starts subscriptions, each getting a response on every event published to the
+    topics of its fields.
+    """
+
+    async def connect(self):
+        self.user = None
+        self.subscriptions = {}
+        self.keep_alive = None
+        subprotocols = self.scope.get("subprotocols") or []
+        await self.accept(SUBSCRIPTION_PROTOCOL if SUBSCRIPTION_PROTOCOL in subprotocols else None)
+
+    async def disconnect(self, code):
+        if self.keep_alive is not None:
+            self.keep_alive.cancel()
+        for subscription_id in list(self.subscriptions):
+            await self.stop(subscription_id)
+
+    async def receive_json(self, content, **kwargs):
+        message_type = content.get("type")
+        subscription_id = content.get("id")
+        if message_type == "connection_init":
+            self.user = await database_sync_to_async(get_websocket_user)(self.scope, content.get("payload") or {})
+            if self.user is None:
+                await self.send_json({"type": "connection_error", "payload": {"message": "Authentication required"}})
+                await self.close()
+                return
+            await self.send_json({"type": "connection_ack"})
+            self.keep_alive = asyncio.ensure_future(self.send_keep_alive())
+        elif message_type == "start":
+            await self.start(subscription_id, content.get("payload") or {})
+        elif message_type == "stop":
+            await self.stop(subscription_id)
+            await self.send_json({"type": "complete", "id": subscription_id})
+        elif message_type == "connection_terminate":
+            await self.close()
+        else:
+            await self.send_json({"type": "error", "id": subscription_id,
+                                  "payload": {"message": f"Unsupported message type {message_type}"}})
+
+    async def send_keep_alive(self):
+        while True:
+            await self.send_json({"type": "ka"})
+            await asyncio.sleep(KEEP_ALIVE_INTERVAL)
+
+    async def start(self, subscription_id, payload):
+        if self.user is None:
+            await self.send_json({"type": "error", "id": subscription_id,
+                                  "payload": {"message": "connection_init required"}})
+            return
+        if self.channel_layer is None:
+            logger.error("GraphQL subscriptions require a channel layer (CHANNEL_LAYERS)")
+            await self.send_json({"type": "error", "id": subscription_id,
+                                  "payload": {"message": "Subscriptions are not available"}})
+            await self.close()
+            return
+        try:
+            subscription = await database_sync_to_async(GraphQLSubscription)(
+                graphene_settings.SCHEMA, payload.get("query"), payload.get("variables"),
+                payload.get("operationName"),
+            )
+        except Exception as exc:
+            await self.send_json({"type": "error", "id": subscription_id,
+                                  "payload": OpenIMISGraphQLView.format_error(exc)})
+            return
+        await self.stop(subscription_id)
+        self.subscriptions[subscription_id] = subscription
+        for topic in subscription.topics:
+            await self.channel_layer.group_add(get_topic_group(topic), self.channel_name)
+
+    async def stop(self, subscription_id):
+        subscription = self.subscriptions.pop(subscription_id, None)
+        if subscription is None:
+            return
+        topics = set().union(*(other.topics for other in self.subscriptions.values()))
+        for topic in subscription.topics - topics:
+            await self.channel_layer.group_discard(get_topic_group(topic), self.channel_name)
+
+    async def graphql_event(self, message):
+        for subscription_id, subscription in list(self.subscriptions.items()):
+            if message["topic"] not in subscription.topics:
+                continue
+            response = await database_sync_to_async(subscription.execute)(self.user, message["event"])
+            if response is not None:
+                await self.send_json({"type": "data", "id": subscription_id, "payload": response})
+
+
+websocket_urlpatterns = [
+    path("ws/graphql", GraphQLSubscriptionConsumer.as_asgi()),
+]
@@ -0,0 +1,29 @@
+from django.test import SimpleTestCase, override_settings
+
+from openIMIS.async_mutations import check_async_mutations_cache
+
+LOCMEM = "django.core.cache.backends.locmem.LocMemCache"
+REDIS = "django.core.cache.backends.redis.RedisCache"
+
+
+def instrumented(backend):
+    # as settings/metrics.py rewrites the caches when METRICS_INSTRUMENT_CACHES is on
+    return {"BACKEND": "openIMIS.metrics.InstrumentedCache", "INSTRUMENTED_BACKEND": backend,
+            "INSTRUMENTED_ALIAS": "default"}
+
+
+@override_settings(GRAPHQL_ASYNC_MUTATIONS_ENABLED=True, GRAPHQL_RESPONSE_CACHE_ALIAS="default")
+class AsyncMutationsCacheCheckTest(SimpleTestCase):
+    def check(self, cache_settings):
+        with self.settings(CACHES={"default": cache_settings}):
+            return [error.id for error in check_async_mutations_cache(None)]
+
+    def test_local_cache(self):
+        self.assertEqual(self.check({"BACKEND": LOCMEM}), ["openIMIS.E001"])
+
+    def test_instrumented_local_cache(self):
+        self.assertEqual(self.check(instrumented(LOCMEM)), ["openIMIS.E001"])
+
+    def test_shared_cache(self):
+        self.assertEqual(self.check({"BACKEND": REDIS, "LOCATION": "redis://localhost:6379"}), [])
+        self.assertEqual(self.check(instrumented(REDIS)), [])
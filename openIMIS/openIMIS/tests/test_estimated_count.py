@@ -0,0 +1,44 @@
+import graphene
+from core.models import MutationLog
+from django.test import TestCase
+from graphene_django import DjangoObjectType
+from graphene_django.filter import DjangoFilterConnectionField
+
+from openIMIS.estimated_count import EstimatedCountMixin, get_estimated_count
+
+
+class MutationLogType(DjangoObjectType):
+    class Meta:
+        model = MutationLog
+        skip_registry = True
+        interfaces = (graphene.relay.Node,)
+        fields = ("status",)
+        filter_fields = ["status"]
+
+
+class EstimatedConnectionField(EstimatedCountMixin, DjangoFilterConnectionField):
+    pass
+
+
+class Query(graphene.ObjectType):
+    mutation_logs = EstimatedConnectionField(MutationLogType)
+
+    def resolve_mutation_logs(self, info, **kwargs):
+        return MutationLog.objects.none()
+
+
+schema = graphene.Schema(query=Query)
+
+
+class EstimatedCountTest(TestCase):
+    def test_empty_querysets(self):
+        self.assertEqual(get_estimated_count(MutationLog.objects.none()), 0)
+        self.assertEqual(get_estimated_count(MutationLog.objects.filter(pk__in=[])), 0)
+
+    def test_empty_connection(self):
+        result = schema.execute(
+            "{ mutationLogs(first: 2, estimatedCount: true) { pageInfo { hasNextPage } edges { node { id } } } }"
+        )
+        self.assertIsNone(result.errors)
+        self.assertEqual(result.data["mutationLogs"]["edges"], [])
+        self.assertFalse(result.data["mutationLogs"]["pageInfo"]["hasNextPage"])
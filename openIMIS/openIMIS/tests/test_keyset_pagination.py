@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import graphene
+from core.models import MutationLog
+from django.test import TestCase, override_settings
+from graphene_django import DjangoObjectType
+
+from openIMIS.keyset_pagination import KeysetConnectionField, cursor_to_keyset, keyset_to_cursor
+
+TEST_LABEL = "keyset pagination test"
+# request times differing only by their microseconds
+MICROSECONDS = [0, 100, 200, 300, 999, 1000, 1500]
+
+
+class MutationLogType(DjangoObjectType):
+    class Meta:
+        model = MutationLog
+        skip_registry = True
+        interfaces = (graphene.relay.Node,)
+        fields = ("request_date_time",)
+        filter_fields = ["status"]
+
+
+class Query(graphene.ObjectType):
+    mutation_logs = KeysetConnectionField(MutationLogType, order_by=graphene.String())
+
+    def resolve_mutation_logs(self, info, order_by=None, **kwargs):
+        return MutationLog.objects.filter(client_mutation_label=TEST_LABEL).order_by(order_by)
+
+
+schema = graphene.Schema(query=Query)
+
+QUERY = """
+query ($after: String, $orderBy: String) {
+  mutationLogs(first: 2, after: $after, orderBy: $orderBy) {
+    pageInfo { hasNextPage endCursor }
+    edges { node { id } }
+  }
+}
+"""
+
+
+@override_settings(GRAPHQL_KEYSET_PAGINATION_ENABLED=True)
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        start = datetime(2024, 1, 1, 12, 0, 0, 123000)
+        for microseconds in MICROSECONDS:
+            log = MutationLog.objects.create(json_content="{}", client_mutation_label=TEST_LABEL)
+            MutationLog.objects.filter(pk=log.pk).update(
+                request_date_time=start + timedelta(microseconds=microseconds)
+            )
+
+    def paginate(self, order_by):
+        ids, after = [], None
+        while True:
+            # one query per page, the connection is not counted
+            with self.assertNumQueries(1):
+                result = schema.execute(QUERY, variables={"after": after, "orderBy": order_by})
+            self.assertIsNone(result.errors)
+            connection = result.data["mutationLogs"]
+            ids += [edge["node"]["id"] for edge in connection["edges"]]
+            after = connection["pageInfo"]["endCursor"]
+            if not connection["pageInfo"]["hasNextPage"]:
+                return ids
+
+    def test_cursor_keeps_microseconds(self):
+        value = datetime(2024, 1, 1, 12, 0, 0, 123456)
+        cursor = keyset_to_cursor(["request_date_time", "pk"], [value, 1])
+        self.assertEqual(cursor_to_keyset(cursor, ["request_date_time", "pk"]), [value, 1])
+
+    def test_paginate_ascending_microseconds(self):
+        ids = self.paginate("request_date_time")
+        self.assertEqual(len(ids), len(MICROSECONDS))
+        self.assertEqual(len(set(ids)), len(MICROSECONDS))
+
+    def test_paginate_descending_microseconds(self):
+        ids = self.paginate("-request_date_time")
+        self.assertEqual(len(ids), len(MICROSECONDS))
+        self.assertEqual(len(set(ids)), len(MICROSECONDS))
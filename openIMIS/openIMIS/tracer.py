@@ -1,7 +1,10 @@
 import logging
-from contextlib import contextmanager
-from .settings import IS_SENTRY_ENABLED, DEBUG
+import random
+import time
+from contextlib import nullcontext
+from .settings import IS_SENTRY_ENABLED, DEBUG, SENTRY_RESOLVER_SAMPLE_RATE, SENTRY_SLOW_RESOLVER_THRESHOLD_MS
 import traceback
+from .metrics import GRAPHQL_RESOLVER_DURATION, IS_METRICS_ENABLED
 
 logger = logging.getLogger(__name__)
 
@@ -19,33 +22,100 @@ class FakeSpan:
         pass
 
 
-@contextmanager
+_FAKE_SPAN_CONTEXT = nullcontext(FakeSpan())
+
+
 def trace(*args, **kwargs):
+    # Plain context managers rather than a generator: this is called for every traced resolver
     if IS_SENTRY_ENABLED:
-        with sentry_sdk.start_span(*args, **kwargs) as span:
-            yield span
-    else:
-        yield FakeSpan()
+        return sentry_sdk.start_span(*args, **kwargs)
+    return _FAKE_SPAN_CONTEXT
+
+
+def sample_resolvers(request):
+    """
+    Decides, once per operation (GraphQLView.get_middleware), whether its resolvers are traced. The decision is kept on
+    the request for TracerMiddleware and the slow resolvers it records are reported by TracerOperationMiddleware.
+    """
+    sampled = (IS_SENTRY_ENABLED or IS_METRICS_ENABLED) and random.random() < SENTRY_RESOLVER_SAMPLE_RATE
+    request.trace_resolvers = sampled
+    request.slow_resolvers = []
+    return sampled
+
+
+class TracerOperationMiddleware:
+    def execute(self, next, request, document, operation_name):
+        with trace(op="graphql.operation") as span:
+            span.set_tag("operation_name", operation_name)
+            span.set_tag("operation_type", document.get_operation_type(operation_name))
+            span.set_tag("resolvers_sampled", getattr(request, "trace_resolvers", False))
+            result = next(request, document, operation_name)
+            slow_resolvers = getattr(request, "slow_resolvers", None)
+            if slow_resolvers:
+                span.set_data("slow_resolvers", slow_resolvers)
+            dataloader_stats = getattr(getattr(request, "dataloaders", None), "stats", None)
+            if dataloader_stats:
+                span.set_data("dataloaders", dataloader_stats)
+            sql_diagnostics_report = getattr(request, "sql_diagnostics_report", None)
+            if sql_diagnostics_report:
+                span.set_data("repeated_sql", sql_diagnostics_report)
+            return result
 
 
 class TracerMiddleware:
+    """
+    Only part of the field middleware chain for sampled operations and SQL diagnostics (see is_enabled), or in DEBUG
+    to log errors.
+    Top level resolvers get their own span, the others are only reported when slower than
+    SENTRY_SLOW_RESOLVER_THRESHOLD_MS (as measured synchronously, promises are not awaited).
+    """
+    slow_threshold = SENTRY_SLOW_RESOLVER_THRESHOLD_MS / 1000
+
+    def is_enabled(self, request):
+        # both decided by GraphQLView.get_middleware (sample_resolvers, request_sql_diagnostics)
+        sampled = getattr(request, "trace_resolvers", False)
+        diagnostics = getattr(request, "sql_diagnostics", None) is not None
+        return sampled or diagnostics or DEBUG
+
     def resolve(self, next, root, info, **kwargs):
-        path = ".".join([str(x) for x in info.path])
-        # Start tracing
-        with trace(op="graphql.resolve") as span:
-            span.set_tag("path", path)  
-            try:
-                # Proceed with the next middleware or resolver
-                return next(root, info, **kwargs)
-            except Exception as e:
-                # Log the exception with its traceback
-                if DEBUG:
-                    logger.error("An error occurred: %s", str(e))
-                    logger.error("Traceback: %s", traceback.format_exc())
-                
-                # Optionally add error information to the trace
+        if len(info.path) != 1:
+            return self._resolve(next, root, info, None, **kwargs)
+        start = time.perf_counter()
+        try:
+            with trace(op="graphql.resolve") as span:
+                span.set_tag("path", str(info.path[0]))
+                return self._resolve(next, root, info, span, **kwargs)
+        finally:
+            GRAPHQL_RESOLVER_DURATION.labels(info.field_name).observe(time.perf_counter() - start)
+
+    def _resolve(self, next, root, info, span, **kwargs):
+        sql_recorder = getattr(info.context, "sql_diagnostics", None)
+        if sql_recorder is not None:
+            parent_path = sql_recorder.current_path
+            sql_recorder.current_path = info.path
+        start = time.perf_counter()
+        try:
+            # Proceed with the next middleware or resolver
+            return next(root, info, **kwargs)
+        except Exception as e:
+            # Log the exception with its traceback
+            if DEBUG:
+                logger.error("An error occurred: %s", str(e))
+                logger.error("Traceback: %s", traceback.format_exc())
+
+            # Optionally add error information to the trace
+            if span is not None:
                 span.set_tag("error", True)
-                span.log_kv({"exception": str(e), "traceback": traceback.format_exc()})
-                
-                # Re-raise the exception to allow GraphQL to handle it
-                raise e
\ No newline at end of file
+                span.set_data("exception", {"exception": str(e), "traceback": traceback.format_exc()})
+
+            # Re-raise the exception to allow GraphQL to handle it
+            raise e
+        finally:
+            if sql_recorder is not None:
+                sql_recorder.current_path = parent_path
+            duration = time.perf_counter() - start
+            if duration >= self.slow_threshold and getattr(info.context, "trace_resolvers", False):
+                info.context.slow_resolvers.append({
+                    "path": ".".join([str(x) for x in info.path]),
+                    "duration_ms": round(duration * 1000, 2),
+                })
@@ -18,17 +18,52 @@ from django.contrib import admin
 from django.urls import path
 from django.views.decorators.csrf import csrf_exempt
 from .views import OpenIMISGraphQLView
+from .metrics import IS_METRICS_ENABLED, metrics_view
 from graphql_jwt.decorators import jwt_cookie
 
 
 from .openimisurls import openimis_urls
-from .settings import SITE_ROOT, DEBUG
+from .settings import (
+    SITE_ROOT, DEBUG, GRAPHQL_BATCH_ENABLED, GRAPHQL_EXPORT_ENABLED, GRAPHQL_ASYNC_MUTATIONS_ENABLED,
+    GRAPHQL_ASGI_ENABLED,
+)
+
+
+def graphql_view(view):
+    if GRAPHQL_ASGI_ENABLED:
+        from .async_execution import asgi_graphql_view
+        return asgi_graphql_view(view)
+    return view
+
 
 urlpatterns = [
     path("%sadmin/" % SITE_ROOT(), admin.site.urls),
     path(
         "%sgraphql" % SITE_ROOT(),
-        csrf_exempt(jwt_cookie(OpenIMISGraphQLView.as_view(graphiql=DEBUG))),
+        graphql_view(csrf_exempt(jwt_cookie(OpenIMISGraphQLView.as_view(graphiql=DEBUG)))),
     ),
     url(r"^ht/", include("health_check.urls")),
 ] + openimis_urls()
+
+if GRAPHQL_BATCH_ENABLED:
+    urlpatterns.append(path(
+        "%sgraphql/batch" % SITE_ROOT(),
+        graphql_view(csrf_exempt(jwt_cookie(OpenIMISGraphQLView.as_view(batch=True)))),
+    ))
+
+if GRAPHQL_EXPORT_ENABLED:
+    from .export import GraphQLExportView
+
+    export_view = csrf_exempt(jwt_cookie(GraphQLExportView.as_view()))
+    urlpatterns += [
+        path("%sgraphql/export" % SITE_ROOT(), export_view),
+        path("%sgraphql/export/<uuid:export_id>" % SITE_ROOT(), export_view),
+    ]
+
+if GRAPHQL_ASYNC_MUTATIONS_ENABLED:
+    from .async_mutations import job_view
+
+    urlpatterns.append(path("%sgraphql/jobs/<uuid:job_id>" % SITE_ROOT(), jwt_cookie(job_view)))
+
+if IS_METRICS_ENABLED:
+    urlpatterns.append(path("metrics", metrics_view))
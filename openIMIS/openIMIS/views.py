@@ -1,13 +1,37 @@
-from django.db import connection, transaction
-from django.http import HttpResponseNotAllowed, HttpResponse
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections, connection, transaction
+from django.http import HttpRequest, HttpResponseNotAllowed, HttpResponse, StreamingHttpResponse
 from django.http.response import HttpResponseBadRequest
+from django.utils import translation
+from .async_mutations import enqueue_mutation, get_job_status, is_async_mutation
+from .coalescing import SharedExecutionResult
 from .dataloaders import get_dataloaders
+from .document_cache import document_backend, get_document_cache_stats
+from .json_encoding import encode_json
+from .operation_middleware import OPERATION_CHAIN_ATTRIBUTE, get_operation_middlewares, operation_middleware_chain
+from .query_cost import QueryCostError, admit_query, analyze_query_cost, check_query_cost
+from .sql_diagnostics import request_sql_diagnostics
+from .streaming import ConnectionStream
+from .persisted_queries import (
+    PersistedQueryError,
+    persisted_query_allowlist,
+    resolve_allowed_query,
+    resolve_persisted_query,
+)
 from . import tracer
 from graphql.execution import ExecutionResult
+from graphql.execution.middleware import MiddlewareManager
 
 from graphene_django.constants import MUTATION_ERRORS_FLAG
 from graphene_django.utils.utils import set_rollback
 from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.utils import get_http_authorization
 from graphene_django.settings import graphene_settings
 from graphene_django.views import GraphQLView as BaseGraphQLView, HttpError
 import logging
@@ -22,10 +46,61 @@ def has_jwt_error(errors):
     return False
 
 
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def get_batch_executor():
+    """Thread pool shared by the batched requests of the process, None if they are executed sequentially"""
+    global _batch_executor
+    if settings.GRAPHQL_BATCH_CONCURRENCY <= 1:
+        return None
+    if _batch_executor is None:
+        with _batch_executor_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(
+                    max_workers=settings.GRAPHQL_BATCH_CONCURRENCY, thread_name_prefix="graphql-batch"
+                )
+    return _batch_executor
+
+
+def authenticate_request(request):
+    """
+    Authenticates the JWT of the request before executing any operation, for the operations executed by a Celery
+    worker as the user
+    """
+    if request.user.is_anonymous and get_http_authorization(request) is not None:
+        try:
+            user = authenticate(request=request)
+        except JSONWebTokenError:
+            return False
+        if user is not None:
+            request.user = user
+    return request.user.is_authenticated
+
+
+def create_worker_request(user):
+    """Request executing an operation out of any HTTP request, as the user"""
+    request = HttpRequest()
+    request.method = "POST"
+    request.content_type = "application/json"
+    request.user = user
+    return request
+
+
 class GraphQLView(BaseGraphQLView):
+    def __init__(self, *args, backend=None, **kwargs):
+        # Share the per-process parsed/validated document cache between all views unless told otherwise
+        if backend is None:
+            backend = document_backend
+        super().__init__(*args, backend=backend, **kwargs)
+
     def json_encode(self, request, d, pretty=False):
         with tracer.trace(op="GraphQLView.json_encode"):
-            return super().json_encode(request, d, pretty=pretty)
+            # bytes rather than str, to avoid copying large responses once more
+            if not (self.pretty or pretty) and not request.GET.get("pretty"):
+                return encode_json(d)
+            return super().json_encode(request, d, pretty=pretty).encode("utf-8")
 
     def _get_response(self, request, data, show_graphiql=False):
         query, variables, operation_name, id = self.get_graphql_params(request, data)
@@ -33,7 +108,9 @@ class GraphQLView(BaseGraphQLView):
         execution_result = self.execute_graphql_request(
             request, data, query, variables, operation_name, show_graphiql
         )
+        return self.get_execution_response(request, execution_result, id, show_graphiql)
 
+    def get_execution_response(self, request, execution_result, id=None, show_graphiql=False):
         if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
             set_rollback()
 
@@ -59,12 +136,90 @@ class GraphQLView(BaseGraphQLView):
                 response["id"] = id
                 response["status"] = status_code
 
-            result = self.json_encode(request, response, pretty=show_graphiql)
+            if isinstance(execution_result, SharedExecutionResult) and not self.batch:
+                # concurrent requests coalesced into one execution also share its encoding
+                pretty = bool(show_graphiql or self.pretty or request.GET.get("pretty"))
+                result = execution_result.encode(
+                    pretty, lambda: self.json_encode(request, response, pretty=show_graphiql)
+                )
+            else:
+                result = self.json_encode(request, response, pretty=show_graphiql)
         else:
             result = None
 
         return result, status_code
 
+    def dispatch(self, request, *args, **kwargs):
+        if not self.batch:
+            return super().dispatch(request, *args, **kwargs)
+        # same as the batch processing of the base view, with the operations executed by get_batch_responses and
+        # encoded as bytes
+        try:
+            if request.method.lower() not in ("get", "post"):
+                raise HttpError(
+                    HttpResponseNotAllowed(
+                        ["GET", "POST"], "GraphQL only supports GET and POST requests."
+                    )
+                )
+            data = self.parse_body(request)
+            responses = self.get_batch_responses(request, data)
+            result = b"[" + b",".join([response[0] for response in responses]) + b"]"
+            status_code = max((response[1] for response in responses), default=200)
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+        except HttpError as e:
+            return self.get_error_response(request, e)
+
+    def get_error_response(self, request, error):
+        response = error.response
+        response["Content-Type"] = "application/json"
+        response.content = self.json_encode(
+            request, {"errors": [self.format_error(error)]}
+        )
+        return response
+
+    def get_batch_responses(self, request, data):
+        """
+        Executes the consecutive queries of a batch concurrently in the batch thread pool, each with its own copy of
+        the request (dataloaders, authenticated user) and database connection. Mutations and operations whose type
+        cannot be told beforehand wait for the previous ones and run alone, in the request thread.
+        """
+        executor = get_batch_executor()
+        if executor is None:
+            return [self.get_response(request, entry) for entry in data]
+        language = translation.get_language()
+        responses = [None] * len(data)
+        pending = {}
+        for index, entry in enumerate(data):
+            if self.get_batch_operation_type(request, entry) == "query":
+                pending[index] = executor.submit(self._get_concurrent_response, request, entry, language)
+                continue
+            for pending_index, future in pending.items():
+                responses[pending_index] = future.result()
+            pending = {}
+            responses[index] = self.get_response(request, entry)
+        for pending_index, future in pending.items():
+            responses[pending_index] = future.result()
+        return responses
+
+    def get_batch_operation_type(self, request, entry):
+        query, variables, operation_name, id = self.get_graphql_params(request, entry)
+        if not query:
+            return None
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+        except Exception:
+            return None
+        return document.get_operation_type(operation_name)
+
+    def _get_concurrent_response(self, request, entry, language):
+        request = copy.copy(request)
+        close_old_connections()
+        try:
+            with translation.override(language):
+                return self.get_response(request, entry)
+        finally:
+            close_old_connections()
+
     def get_response(self, request, data, show_graphiql=False):
         with tracer.trace(op="GraphQLView.get_response") as span:
             result, status_code = self._get_response(
@@ -73,6 +228,21 @@ class GraphQLView(BaseGraphQLView):
             span.set_tag("status_code", status_code)
         return result, status_code
 
+    def get_middleware(self, request):
+        # decided once per operation, before the field middleware opt out (TracerMiddleware.is_enabled reads them):
+        # resolver tracing is sampled and only superusers' headers enable SQL diagnostics
+        tracer.sample_resolvers(request)
+        request_sql_diagnostics(request)
+        # Field middleware may opt out per operation, an empty chain avoids wrapping every resolver at all
+        middleware = super().get_middleware(request)
+        if not middleware or isinstance(middleware, MiddlewareManager):
+            return middleware
+        return [m for m in middleware if not hasattr(m, "is_enabled") or m.is_enabled(request)]
+
+    def get_executor(self, request):
+        # set by asgi_graphql_view, executing the async resolvers on the event loop
+        return getattr(request, "graphql_executor", None) or self.executor
+
     def get_context(self, request):
         request.dataloaders = get_dataloaders()
         return request
@@ -98,8 +268,9 @@ class GraphQLView(BaseGraphQLView):
 
         try:
             backend = self.get_backend(request)
-            with tracer.trace(op="backend.document_from_string"):
+            with tracer.trace(op="backend.document_from_string") as span:
                 document = backend.document_from_string(self.schema, query)
+                span.set_data("document_cache", get_document_cache_stats())
         except Exception as e:
             return ExecutionResult(errors=[e], invalid=True)
 
@@ -118,12 +289,21 @@ class GraphQLView(BaseGraphQLView):
                     )
                 )
 
+        try:
+            query_cost = analyze_query_cost(self.schema, document.document_ast, operation_name, variables)
+            # exposed to the rate limiting middleware
+            request.graphql_query_cost = query_cost
+            check_query_cost(query_cost)
+        except QueryCostError as e:
+            return ExecutionResult(errors=[e], invalid=True)
+
         try:
             extra_options = {}
-            if self.executor:
+            executor = self.get_executor(request)
+            if executor:
                 # We only include it optionally since
                 # executor is not a valid argument in all backends
-                extra_options["executor"] = self.executor
+                extra_options["executor"] = executor
 
             options = {
                 "root_value": self.get_root_value(request),
@@ -139,21 +319,135 @@ class GraphQLView(BaseGraphQLView):
                 graphene_settings.ATOMIC_MUTATIONS is True
                 or connection.settings_dict.get("ATOMIC_MUTATIONS", False) is True
             ):
-                with transaction.atomic():
-                    result = document.execute(**options)
+                with admit_query(query_cost), transaction.atomic():
+                    result = self.execute_document(request, document, operation_name, options)
                     if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
                         transaction.set_rollback(True)
                 return result
-            with tracer.trace(op="document.execute"):
-                return document.execute(**options)
+            with tracer.trace(op="document.execute") as span:
+                span.set_tag("query_depth", query_cost.depth)
+                span.set_tag("query_cost", query_cost.cost)
+                with admit_query(query_cost):
+                    return self.execute_document(request, document, operation_name, options)
         except Exception as e:
             return ExecutionResult(errors=[e], invalid=True)
 
+    def execute_document(self, request, document, operation_name, options):
+        return document.execute(**options)
+
 
 class OpenIMISGraphQLView(GraphQLView):
-    def execute_graphql_request(self, *args, **kwargs):
+    def dispatch(self, request, *args, **kwargs):
+        # ASGI serves the sync iterators of StreamingHttpResponse once fully consumed: no streaming there
+        if settings.GRAPHQL_STREAMING_ENABLED and not self.batch and request.GET.get("stream") == "true" \
+                and not isinstance(request, ASGIRequest):
+            try:
+                return self.get_streaming_response(request)
+            except HttpError as e:
+                return self.get_error_response(request, e)
+        if settings.GRAPHQL_ASYNC_MUTATIONS_ENABLED and not self.batch and request.GET.get("async") == "true" \
+                and request.method.lower() == "post":
+            try:
+                response = self.get_async_response(request)
+            except HttpError as e:
+                return self.get_error_response(request, e)
+            if response is not None:
+                return response
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_async_response(self, request):
+        """
+        With the `async=true` parameter, a mutation allowed by GRAPHQL_ASYNC_MUTATIONS is executed by a Celery worker
+        instead of the web worker: the response only holds its job in its extensions, whose status, progress and
+        result are answered by graphql/jobs/<id> and sent to the websocket ws/graphql/jobs/<id>. None for the other
+        operations, executed as usual.
+        """
+        data = self.parse_body(request)
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        try:
+            query, document = self.get_document(request, data, query)
+        except Exception:
+            # errors answered by the usual execution
+            return None
+        if not is_async_mutation(document, operation_name):
+            return None
+        if not authenticate_request(request):
+            return HttpResponse(status=401, content_type="application/json", content=self.json_encode(
+                request, {"errors": [{"message": "Authentication required"}]}
+            ))
+        job = enqueue_mutation(request.user, {"query": query, "variables": variables, "operationName": operation_name})
+        return HttpResponse(status=202, content_type="application/json", content=self.json_encode(
+            request, {"data": None, "extensions": {"job": get_job_status(job)}}
+        ))
+
+    def get_streaming_response(self, request):
+        """
+        With the `stream=true` parameter, the edges of a query on a single connection are streamed page by page
+        (see ConnectionStream) instead of being built and encoded at once. Other operations get the usual response.
+        """
+        data = self.parse_body(request)
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        stream = request.graphql_stream = ConnectionStream(settings.GRAPHQL_STREAMING_PAGE_SIZE)
+        execution_result = self.execute_graphql_request(request, data, query, variables, operation_name)
+        if not stream.started or execution_result.errors or execution_result.invalid:
+            result, status_code = self.get_execution_response(request, execution_result, id)
+            return HttpResponse(status=status_code, content=result, content_type="application/json")
+        return StreamingHttpResponse(
+            stream.iter_json(
+                execution_result,
+                lambda: self.execute_graphql_request(request, data, query, variables, operation_name),
+                self.format_error,
+            ),
+            content_type="application/json",
+        )
+
+    def get_middleware(self, request):
+        # executed through GRAPHQL_OPERATION_MIDDLEWARE (execute_document), without OperationFallbackMiddleware
+        setattr(request, OPERATION_CHAIN_ATTRIBUTE, True)
+        middleware = super().get_middleware(request)
+        stream = getattr(request, "graphql_stream", None)
+        if stream is not None and not isinstance(middleware, MiddlewareManager):
+            middleware = [*(middleware or []), stream]
+        return middleware
+
+    def resolve_query(self, request, data, query):
+        if settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+            return resolve_allowed_query(self.schema, request, data, query)
+        return resolve_persisted_query(request, data, query)
+
+    def get_document(self, request, data, query):
+        """Query (persisted ones resolved) and document of an operation executed later, by a Celery worker"""
+        query = self.resolve_query(request, data, query)
+        if not query:
+            raise ValueError("Must provide query string.")
+        return query, self.get_backend(request).document_from_string(self.schema, query)
+
+    def get_backend(self, request):
+        if settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+            # registered documents are already parsed and validated
+            return persisted_query_allowlist
+        return super().get_backend(request)
+
+    def execute_document(self, request, document, operation_name, options):
+        """Run the operation through GRAPHQL_OPERATION_MIDDLEWARE (once per operation) before executing it"""
+        request.graphql_variables = options.get("variable_values")
+        execute = operation_middleware_chain(
+            lambda request, document, operation_name: document.execute(**options),
+            get_operation_middlewares(),
+        )
+        return execute(request, document, operation_name)
+
+    def execute_graphql_request(
+        self, request, data, query, variables, operation_name, show_graphiql=False
+    ):
         """Extract any exceptions and send them to Sentry"""
-        result = super().execute_graphql_request(*args, **kwargs)
+        try:
+            query = self.resolve_query(request, data, query)
+        except PersistedQueryError as e:
+            return ExecutionResult(errors=[e], invalid=e.invalid)
+        result = super().execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql
+        )
         if result.errors:
             self._capture_sentry_exceptions(result.errors)
         return result
@@ -0,0 +1,45 @@
+from http.cookies import SimpleCookie
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from graphql_jwt.exceptions import JSONWebTokenError
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.shortcuts import get_user_by_token
+
+
+def get_scope_token(scope):
+    """JWT of the authorization header or of the JWT cookie of a websocket, None if it has none"""
+    cookies = SimpleCookie()
+    prefix = f"{jwt_settings.JWT_AUTH_HEADER_PREFIX} "
+    for name, value in scope.get("headers", []):
+        value = value.decode("latin-1")
+        if name == b"authorization" and value.startswith(prefix):
+            return value[len(prefix):]
+        if name == b"cookie":
+            cookies.load(value)
+    cookie = cookies.get(jwt_settings.JWT_COOKIE_NAME)
+    return cookie.value if cookie else None
+
+
+def get_token_user(token):
+    """User of a JWT, None if it is invalid or expired"""
+    try:
+        user = get_user_by_token(token)
+    except JSONWebTokenError:
+        return None
+    return user if user is not None and user.is_authenticated else None
+
+
+def get_scope_user(scope):
+    token = get_scope_token(scope)
+    return (get_token_user(token) if token else None) or AnonymousUser()
+
+
+class JSONWebTokenAuthMiddleware(BaseMiddleware):
+    """Authenticates the websockets with the JWT of their authorization header or cookie, as scope["user"]"""
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope["user"] = await database_sync_to_async(get_scope_user)(scope)
+        return await super().__call__(scope, receive, send)
@@ -1,7 +1,8 @@
 import logging
 from django.apps import AppConfig
 from django.conf import settings
-import importlib.util
+
+from openIMIS.module_registry import module_registry
 
 logger = logging.getLogger(__name__)
 
@@ -18,10 +19,10 @@ class ReceiversBindingConfig(AppConfig):
 
     def _bind_app_reveivers(self, app_):
         try:
-            schema = __import__(f"{app_}.receivers")
+            module_registry.get_submodule(app_, "receivers")
         except ModuleNotFoundError as exc:
-            # The module doesn't have a schema.py, just skip
+            # A dependency of the receivers is missing, just skip
             #logger.debug(f"{app} has no reciever module, skipping")
             pass     
         except Exception as exc:
-            raise
\ No newline at end of file
+            raise
@@ -1,7 +1,9 @@
 import logging
 from django.apps import AppConfig
 from django.conf import settings
-import importlib.util
+from django.core import checks
+
+from openIMIS.module_registry import module_registry
 
 logger = logging.getLogger(__name__)
 
@@ -11,21 +13,49 @@ class SignalBindingConfig(AppConfig):
 
     def ready(self):
         self.bind_service_signals()
+        self.bind_response_cache_invalidation()
+        self.bind_subscription_events()
+        self.register_checks()
+        self.load_persisted_queries()
 
     def bind_service_signals(self):
         for app in settings.OPENIMIS_APPS:
             self._bind_app_signals(app)
 
+    def bind_response_cache_invalidation(self):
+        # after the apps, so that the service signals they register can be bound
+        from openIMIS.response_cache import connect_invalidation_signals
+        connect_invalidation_signals()
+
+    def bind_subscription_events(self):
+        from openIMIS.subscriptions import connect_subscription_signals
+        connect_subscription_signals()
+
+    def register_checks(self):
+        from openIMIS.async_mutations import check_async_mutations_cache
+        from openIMIS.field_cache import check_field_cache
+        from openIMIS.persisted_queries import check_persisted_queries
+        checks.register(check_async_mutations_cache, checks.Tags.caches)
+        checks.register(check_field_cache, checks.Tags.caches)
+        checks.register(check_persisted_queries)
+
+    def load_persisted_queries(self):
+        # parsed and validated when the process starts rather than on its first request
+        if not settings.GRAPHQL_PERSISTED_QUERIES_ONLY:
+            return
+        from graphene_django.settings import graphene_settings
+        from openIMIS.persisted_queries import persisted_query_allowlist
+        try:
+            persisted_query_allowlist.load(graphene_settings.SCHEMA)
+        except Exception:
+            logger.exception("Failed to load the persisted queries")
+
     def _bind_app_signals(self, app_):
         try:
-            spec = importlib.util.find_spec(f"{app_}.signals")
-            if spec:
-                app = __import__(f"{app_}.signals")
-                if (
-                    hasattr(app, "signals") and
-                    hasattr(app.signals, "bind_service_signals")
-                ):
-                    app.signals.bind_service_signals()
+            signals = module_registry.get_submodule(app_, "signals")
+            if signals is not None:
+                if hasattr(signals, "bind_service_signals"):
+                    signals.bind_service_signals()
                     logger.debug(f"{app_} service signals connected")
                 else:
                     logger.debug(